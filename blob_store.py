@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+
+from locks import locked, atomic_write
+
+# Layout under `root` (LOCAL_DIR / local_backups):
+#   .blobs/ab/abcdef...       file contents, named by sha256, stored once
+#   .blobs/refs.json          {hash: number of manifest versions using it}
+#   .manifests/<user>.json    {logical name: [version, ...]}, oldest first
+BLOBS = ".blobs"
+MANIFESTS = ".manifests"
+# Written once the legacy `<root>/<user>/` folders have been imported
+MIGRATED = ".migrated"
+CHUNK_SIZE = 1024 * 1024
+MAX_VERSIONS = int(os.getenv("LOCAL_MAX_VERSIONS", "20"))
+# fsync blobs and manifests before they become visible (crash durability at
+# the cost of write latency)
+FSYNC = os.getenv("LOCAL_FSYNC", "0") == "1"
+
+
+_listeners = []
+
+
+def subscribe(listener):
+    # `listener(event, root, user, name, version)` runs after a change is
+    # committed: event is "put" (new latest version) or "delete" (name gone,
+    # or `version` dropped). Used by the search indexes to stay incremental.
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def _emit(event, root, user, name, version):
+    for listener in list(_listeners):
+        try:
+            listener(event, root, user, name, version)
+        except Exception:
+            pass
+
+
+def blob_path(root, digest):
+    return os.path.join(root, BLOBS, digest[:2], digest)
+
+
+def _refs_path(root):
+    return os.path.join(root, BLOBS, "refs.json")
+
+
+def valid_user(user):
+    # User names become file names in the store: anything hidden (which could
+    # name `.blobs` / `.manifests`) or containing a separator is refused.
+    if not user or user.startswith(".") or "\0" in user:
+        return False
+    return not any(sep and sep in user for sep in ("/", "\\", os.sep, os.altsep))
+
+
+def check_user(user):
+    if not valid_user(user):
+        raise ValueError(f"Invalid user name: {user!r}")
+    return user
+
+
+def _manifest_path(root, user):
+    return os.path.join(root, MANIFESTS, f"{check_user(user)}.json")
+
+
+def _load_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_json(path, data, fsync=False):
+    atomic_write(path, json.dumps(data, indent=1, sort_keys=True), fsync=fsync)
+
+
+def load_manifest(root, user):
+    return _load_json(_manifest_path(root, user))
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _hash_to_temp(root, src, fsync=False):
+    # Hash while copying into a temp file on the same filesystem, so the blob
+    # can be renamed into place without reading the source twice.
+    tmp_dir = os.path.join(root, BLOBS)
+    os.makedirs(tmp_dir, exist_ok=True)
+    h = hashlib.sha256()
+    size = 0
+    fd, tmp = tempfile.mkstemp(dir=tmp_dir, prefix=".incoming-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            if isinstance(src, bytes):
+                h.update(src)
+                out.write(src)
+                size = len(src)
+            else:
+                with open(src, "rb") as f:
+                    while True:
+                        chunk = f.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        h.update(chunk)
+                        out.write(chunk)
+                        size += len(chunk)
+            if fsync:
+                out.flush()
+                os.fsync(out.fileno())
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return h.hexdigest(), size, tmp
+
+
+def _incref(root, refs, digest, tmp):
+    dest = blob_path(root, digest)
+    if os.path.exists(dest):
+        os.remove(tmp)
+    else:
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(tmp, dest)
+    refs[digest] = refs.get(digest, 0) + 1
+
+
+def _decref(root, refs, digest):
+    count = refs.get(digest, 0) - 1
+    if count > 0:
+        refs[digest] = count
+        return
+    refs.pop(digest, None)
+    try:
+        os.remove(blob_path(root, digest))
+    except FileNotFoundError:
+        pass
+
+
+def put(root, user, name, src, mtime=None, fsync=None):
+    # Store `src` (a file path or bytes) as the newest version of `name` for
+    # `user`. Re-saving identical bytes adds no version and no blob. Returns
+    # (version, created). Blob and manifest are each written to a temp file
+    # and renamed into place, so a crash never leaves a truncated backup.
+    fsync = FSYNC if fsync is None else fsync
+    digest, size, tmp = _hash_to_temp(root, src, fsync)
+    manifest_file = _manifest_path(root, user)
+    with locked(manifest_file):
+        manifest = load_manifest(root, user)
+        versions = manifest.setdefault(name, [])
+        if versions and versions[-1]["hash"] == digest:
+            os.remove(tmp)
+            return versions[-1], False
+        version = {
+            "hash": digest,
+            "size": size,
+            "saved_at": time.time() if mtime is None else mtime
+        }
+        with locked(_refs_path(root)):
+            refs = _load_json(_refs_path(root))
+            _incref(root, refs, digest, tmp)
+            versions.append(version)
+            while len(versions) > MAX_VERSIONS:
+                _decref(root, refs, versions.pop(0)["hash"])
+            _save_json(_refs_path(root), refs, fsync)
+        _save_json(manifest_file, manifest, fsync)
+    _emit("put", root, user, name, version)
+    return version, True
+
+
+def delete(root, user, name, digest=None):
+    # Drop all versions of `name` (or just the one with `digest`). Blobs are
+    # removed only once no version in any manifest refers to them.
+    manifest_file = _manifest_path(root, user)
+    with locked(manifest_file):
+        manifest = load_manifest(root, user)
+        versions = manifest.get(name, [])
+        dropped = [v for v in versions if digest is None or v["hash"] == digest]
+        if not dropped:
+            return False
+        kept = [v for v in versions if v not in dropped]
+        if kept:
+            manifest[name] = kept
+        else:
+            manifest.pop(name, None)
+        with locked(_refs_path(root)):
+            refs = _load_json(_refs_path(root))
+            for v in dropped:
+                _decref(root, refs, v["hash"])
+            _save_json(_refs_path(root), refs)
+        _save_json(manifest_file, manifest)
+    if kept:
+        _emit("put", root, user, name, kept[-1])
+    else:
+        _emit("delete", root, user, name, None)
+    return True
+
+
+def history(root, user, name):
+    return list(load_manifest(root, user).get(name, []))
+
+
+def list_files(root, user):
+    # Latest version of each logical file: {"name", "path", "size", "mtime",
+    # "hash", "versions"}, the shape local_files.describe renders.
+    entries = []
+    for name, versions in load_manifest(root, user).items():
+        if not versions:
+            continue
+        latest = versions[-1]
+        entries.append({
+            "name": name,
+            "path": blob_path(root, latest["hash"]),
+            "hash": latest["hash"],
+            "size": latest["size"],
+            "mtime": latest["saved_at"],
+            "versions": len(versions)
+        })
+    entries.sort(key=lambda x: x["name"])
+    return entries
+
+
+def import_dir(root, user, directory, remove=True):
+    # Migrate a legacy flat per-user folder into the store. Each file becomes
+    # a logical name; originals are removed only after they are stored.
+    check_user(user)
+    imported = 0
+    if not os.path.isdir(directory):
+        return imported
+    with os.scandir(directory) as it:
+        for entry in sorted(it, key=lambda e: e.name):
+            if not entry.is_file() or entry.name.endswith(".lock"):
+                continue
+            put(root, user, entry.name, entry.path, mtime=entry.stat().st_mtime)
+            if remove:
+                os.remove(entry.path)
+            imported += 1
+    return imported
+
+
+def migrate_legacy(root):
+    # One-time import of every legacy `<root>/<user>/` folder, recorded by a
+    # marker file so later startups skip the scan. Hidden folders are the
+    # store's own and are never touched.
+    marker = os.path.join(root, MIGRATED)
+    if os.path.exists(marker):
+        return 0
+    imported = 0
+    with locked(marker):
+        if os.path.exists(marker):
+            return 0
+        if os.path.isdir(root):
+            with os.scandir(root) as it:
+                users = [e for e in it if e.is_dir() and valid_user(e.name)]
+            for entry in users:
+                imported += import_dir(root, entry.name, entry.path)
+                try:
+                    os.rmdir(entry.path)
+                except OSError:
+                    pass
+        atomic_write(marker, f"{time.time()}\n")
+    return imported
@@ -0,0 +1,121 @@
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import rate_limit
+from streaming import JSONFileBody
+
+BLOB_WORKERS = int(os.getenv("GITHUB_BLOB_WORKERS", "8"))
+REF_UPDATE_ATTEMPTS = 3
+
+
+class GitDataError(Exception):
+    def __init__(self, step, response):
+        self.step = step
+        self.status_code = response.status_code
+        try:
+            self.detail = response.json()
+        except ValueError:
+            self.detail = response.text
+        super().__init__(f"{step} failed ({self.status_code}): {self.detail}")
+
+
+def _check(step, response, ok=(200, 201)):
+    if response.status_code not in ok:
+        raise GitDataError(step, response)
+    return response.json()
+
+
+def blob_sha(content):
+    # Git's object id for `content` (bytes or a file path), i.e. the SHA the
+    # Contents API reports, computed locally without uploading anything.
+    if isinstance(content, bytes):
+        h = hashlib.sha1(b"blob %d\0" % len(content))
+        h.update(content)
+        return h.hexdigest()
+    h = hashlib.sha1(b"blob %d\0" % os.path.getsize(content))
+    with open(content, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def create_blob(client, file_path, offset=0, length=None):
+    body = JSONFileBody({"encoding": "base64"}, file_path, offset=offset, length=length)
+    r = client.post("git/blobs", data=body, headers={"Content-Type": "application/json"})
+    return _check("create blob", r)["sha"]
+
+
+def create_text_blob(client, text):
+    r = client.post("git/blobs", json={"content": text, "encoding": "utf-8"})
+    return _check("create blob", r)["sha"]
+
+
+def create_blobs(client, file_paths, max_workers=BLOB_WORKERS, on_progress=None):
+    # Blob creation is independent per file, so it runs in parallel on the
+    # client's connection pool. Items are file paths or (path, offset,
+    # length) byte ranges. Returns SHAs in the order given.
+    if not file_paths:
+        return []
+    done = []
+    lock = threading.Lock()
+    level = rate_limit.current_priority()
+
+    def one(path):
+        with rate_limit.priority(level):
+            sha = create_blob(client, *path) if isinstance(path, tuple) else create_blob(client, path)
+        if on_progress:
+            with lock:
+                done.append(path)
+                on_progress(len(done) / len(file_paths))
+        return sha
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(file_paths))) as pool:
+        return list(pool.map(one, file_paths))
+
+
+def get_head(client, branch):
+    ref = _check("get ref", client.get(f"git/ref/heads/{branch}"))
+    commit_sha = ref["object"]["sha"]
+    commit = _check("get commit", client.get(f"git/commits/{commit_sha}"))
+    return commit_sha, commit["tree"]["sha"]
+
+
+def commit_entries(client, entries, message, branch):
+    # Write all `entries` (tree entries; `sha: None` removes a path) as one
+    # tree + one commit on top of the current head. If the branch moved
+    # underneath us, rebuild on the new head instead of force-pushing.
+    for attempt in range(REF_UPDATE_ATTEMPTS):
+        head_sha, base_tree = get_head(client, branch)
+        tree = _check("create tree", client.post("git/trees", json={
+            "base_tree": base_tree,
+            "tree": entries
+        }))
+        commit = _check("create commit", client.post("git/commits", json={
+            "message": message,
+            "tree": tree["sha"],
+            "parents": [head_sha]
+        }))
+        r = client.patch(f"git/refs/heads/{branch}", json={"sha": commit["sha"], "force": False})
+        if r.status_code == 200:
+            return commit["sha"]
+        if r.status_code != 422 or attempt == REF_UPDATE_ATTEMPTS - 1:
+            raise GitDataError("update ref", r)
+
+
+def upload_files(client, files, message, branch, max_workers=BLOB_WORKERS, on_progress=None):
+    # `files` is a list of (repo_path, local_path). One commit for all of them.
+    # Returns (commit_sha, tree entries) so callers know each blob SHA.
+    shas = create_blobs(client, [local for _, local in files], max_workers, on_progress)
+    entries = [
+        {"path": repo_path, "mode": "100644", "type": "blob", "sha": sha}
+        for (repo_path, _), sha in zip(files, shas)
+    ]
+    return commit_entries(client, entries, message, branch), entries
+
+
+def delete_paths(client, paths, message, branch):
+    # Remove every path in one tree update / one commit.
+    entries = [{"path": p, "mode": "100644", "type": "blob", "sha": None} for p in paths]
+    return commit_entries(client, entries, message, branch)
@@ -0,0 +1,114 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from rate_limit import get_scheduler
+
+API_URL = "https://api.github.com"
+
+# Tunables (seconds / counts), overridable from the environment
+CONNECT_TIMEOUT = float(os.getenv("GITHUB_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("GITHUB_READ_TIMEOUT", "60"))
+MAX_RETRIES = int(os.getenv("GITHUB_MAX_RETRIES", "3"))
+BACKOFF_FACTOR = float(os.getenv("GITHUB_BACKOFF_FACTOR", "0.5"))
+POOL_SIZE = int(os.getenv("GITHUB_POOL_SIZE", "10"))
+RATE_LIMIT_RETRIES = int(os.getenv("GITHUB_RATE_LIMIT_RETRIES", "3"))
+
+
+class GitHubClient:
+    # One keep-alive connection pool + prebuilt auth headers per repo, shared
+    # by every session/thread in the process (requests.Session is safe to
+    # share for plain request calls).
+
+    def __init__(self, token, owner, repo, branch="main",
+                 timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+                 retries=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR,
+                 pool_size=POOL_SIZE):
+        self.owner = owner
+        self.repo = repo
+        self.branch = branch
+        self.timeout = timeout
+        self.scheduler = get_scheduler()
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/vnd.github+json",
+            "X-GitHub-Api-Version": "2022-11-28"
+        })
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(500, 502, 503, 504),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def repo_url(self, path=""):
+        return f"{API_URL}/repos/{self.owner}/{self.repo}/{path.lstrip('/')}"
+
+    def contents_url(self, path):
+        return self.repo_url(f"contents/{path.strip('/')}")
+
+    def request(self, method, url, **kwargs):
+        if not url.startswith(("http://", "https://")):
+            url = self.repo_url(url)
+        kwargs.setdefault("timeout", self.timeout)
+        # Every call goes through the shared scheduler, which may hold it
+        # until budget is available; rate-limited replies are retried after
+        # the scheduler's backoff instead of surfacing to the user.
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            self.scheduler.acquire(method)
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except BaseException:
+                self.scheduler.release()
+                raise
+            if not self.scheduler.record(response) or attempt == RATE_LIMIT_RETRIES:
+                return response
+            response.close()
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(token=None, owner=None, repo=None, branch=None):
+    # Process-wide client per (token, owner, repo, branch), defaulting to the
+    # same env vars both apps already read.
+    token = token if token is not None else os.getenv("GITHUB_TOKEN")
+    owner = owner if owner is not None else os.getenv("REPO_OWNER")
+    repo = repo if repo is not None else os.getenv("REPO_NAME")
+    branch = branch if branch is not None else os.getenv("BRANCH", "main")
+    key = (token, owner, repo, branch)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = GitHubClient(token, owner, repo, branch)
+        return client
@@ -0,0 +1,295 @@
+import os
+import re
+import json
+import threading
+
+import blob_store
+from locks import atomic_write
+
+# Parsed symbols are cached on disk per content hash, so a file is parsed
+# once no matter how many users/versions share it or how often we restart.
+CACHE_DIR = os.getenv("JAVA_INDEX_DIR", os.path.join("local_backups", ".index", "java"))
+REFRESH_INTERVAL = float(os.getenv("JAVA_INDEX_INTERVAL", "300"))
+PARSER_VERSION = 2
+
+_COMMENT_OR_STRING = re.compile(
+    r'//[^\n]*|/\*.*?\*/|"""(?:\\.|[^\\])*?"""|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'',
+    re.S
+)
+_ANNOTATION = re.compile(r'@(?!interface\b)[\w$.]+(?:\s*\([^()]*\))?')
+_PACKAGE = re.compile(r'^\s*package\s+([\w$.]+)\s*$')
+_CLASS = re.compile(r'\b(class|interface|enum|record|@interface)\s+([A-Za-z_$][\w$]*)')
+_METHOD = re.compile(r'([A-Za-z_$][\w$]*)\s*\([^;{}]*\)\s*(?:throws\s+[\w$.,\s]+)?(?:default\s+[^;{}]*)?$', re.S)
+_FIELD = re.compile(r'^[\w$<>\[\],.?\s]*?[\w$>\]]\s+([A-Za-z_$][\w$]*)\s*(?:=|,|\[|$)', re.S)
+_DECLARATOR = re.compile(r'\s*([A-Za-z_$][\w$]*)\s*(?:=|\[|$)', re.S)
+_NOT_METHODS = {"if", "for", "while", "switch", "catch", "synchronized", "return", "new", "throw", "else", "try", "do"}
+
+
+def _blank(match):
+    # Keep newlines so line numbers survive stripping comments/strings
+    return re.sub(r'[^\n]', ' ', match.group(0))
+
+
+def _split_top(text):
+    # Split on commas outside <>, (), [] and {} (generics, call arguments)
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(text):
+        if ch in "<([{":
+            depth += 1
+        elif ch in ">)]}":
+            depth = max(0, depth - 1)
+        elif ch == "," and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def _field_names(statement):
+    # `int X = 1, Y[] = {2}` -> ["X", "Y"]; [] if it isn't a declaration.
+    # A leading comma continues a declaration whose initializer was a block:
+    # `int[] a = {1}, b;` reaches here as `, b`.
+    parts = _split_top(statement)
+    if statement.startswith(","):
+        names = []
+    else:
+        m = _FIELD.match(parts[0])
+        if not m:
+            return []
+        names = [m.group(1)]
+    for part in parts[1:]:
+        m = _DECLARATOR.match(part)
+        if m:
+            names.append(m.group(1))
+    return names
+
+
+def parse(source):
+    # Lightweight structural parse: package, types, methods and fields with
+    # their line numbers. Not a full Java grammar, but enough for lookup.
+    text = _COMMENT_OR_STRING.sub(_blank, source)
+    symbols = []
+    stack = []  # ("class", name) / ("method", name) / ("block", None)
+    seg_start = 0
+
+    def line_of(pos):
+        return text.count("\n", 0, pos) + 1
+
+    def container():
+        names = [name for kind, name in stack if kind == "class"]
+        return ".".join(names)
+
+    def in_class_body():
+        return bool(stack) and stack[-1][0] == "class"
+
+    def add_fields(header, base):
+        pos = 0
+        for name in _field_names(header.strip()):
+            found = re.compile(r'\b%s\b' % re.escape(name)).search(header, pos)
+            pos = found.end() if found else pos
+            symbols.append({"kind": "field", "name": name, "container": container(),
+                            "line": line_of(base + (found.start() if found else header.find(name)))})
+
+    for pos, ch in enumerate(text):
+        if ch not in "{};":
+            continue
+        raw = text[seg_start:pos]
+        header = _ANNOTATION.sub(_blank, raw)
+        base = seg_start
+        seg_start = pos + 1
+
+        if ch == "}":
+            if stack:
+                stack.pop()
+            continue
+
+        if ch == "{":
+            m = _CLASS.search(header)
+            if m and "(" not in header[:m.start()] and "=" not in header[:m.start()]:
+                kind = "interface" if m.group(1) == "@interface" else m.group(1)
+                symbols.append({"kind": kind, "name": m.group(2), "container": container(),
+                                "line": line_of(base + m.start(2))})
+                stack.append(("class", m.group(2)))
+                continue
+            if in_class_body():
+                m = _METHOD.search(header.strip())
+                if m and m.group(1) not in _NOT_METHODS and "=" not in header.split("(")[0]:
+                    offset = header.find(m.group(1))
+                    symbols.append({"kind": "method", "name": m.group(1), "container": container(),
+                                    "line": line_of(base + offset)})
+                    stack.append(("method", m.group(1)))
+                    continue
+                if "=" in header:
+                    # Brace initializer or anonymous class: `int[] a = {`,
+                    # `Runnable r = new Runnable() {`
+                    add_fields(header, base)
+            stack.append(("block", None))
+            continue
+
+        # ";" ends a statement
+        statement = header.strip()
+        if not stack:
+            m = _PACKAGE.match(statement)
+            if m:
+                symbols.append({"kind": "package", "name": m.group(1), "container": "",
+                                "line": line_of(base + header.find("package"))})
+            continue
+        if not in_class_body() or not statement:
+            continue
+        m = _METHOD.search(statement)
+        if m and m.group(1) not in _NOT_METHODS and "=" not in statement.split("(")[0]:
+            # Abstract / interface method
+            symbols.append({"kind": "method", "name": m.group(1), "container": container(),
+                            "line": line_of(base + header.find(m.group(1)))})
+            continue
+        if not statement.startswith(("return", "import", "package")):
+            add_fields(header, base)
+    return symbols
+
+
+class JavaIndex:
+    # In-memory symbol index over the latest version of every `.java` file in
+    # the given backup roots (blob store manifests plus legacy flat
+    # `<root>/<user>/*.java` folders). Lookups by symbol name are a dict hit.
+
+    def __init__(self, roots, cache_dir=CACHE_DIR):
+        self.roots = roots
+        self.cache_dir = cache_dir
+        self.lock = threading.Lock()
+        self.symbols = {}    # hash -> [symbol]
+        self.owners = {}     # hash -> {(user, file name)}
+        self.postings = {}   # lower-case symbol name -> {hash}
+        self.file_hashes = {}  # legacy path -> ((mtime, size), sha256)
+        self.wake = threading.Event()
+        self.thread = None
+
+    def _sources(self):
+        # Yields (user, file name, sha256, readable path)
+        for root in self.roots:
+            if not os.path.isdir(root):
+                continue
+            with os.scandir(root) as it:
+                dirs = [e for e in it if e.is_dir() and not e.name.startswith(".")]
+            for d in dirs:
+                with os.scandir(d.path) as files:
+                    for f in files:
+                        if f.is_file() and f.name.endswith(".java"):
+                            yield d.name, f.name, self._legacy_hash(f), f.path
+            manifests = os.path.join(root, blob_store.MANIFESTS)
+            if not os.path.isdir(manifests):
+                continue
+            for fname in os.listdir(manifests):
+                if not fname.endswith(".json"):
+                    continue
+                user = fname[:-len(".json")]
+                for entry in blob_store.list_files(root, user):
+                    if entry["name"].endswith(".java"):
+                        yield user, entry["name"], entry["hash"], entry["path"]
+
+    def _legacy_hash(self, entry):
+        # Loose files aren't content-addressed; hash only when they change.
+        st = entry.stat()
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self.file_hashes.get(entry.path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        digest = blob_store.file_sha256(entry.path)
+        self.file_hashes[entry.path] = (stamp, digest)
+        return digest
+
+    def _load_symbols(self, digest, path):
+        cache_file = os.path.join(self.cache_dir, f"{digest}.json")
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("version") == PARSER_VERSION:
+                return cached["symbols"]
+        except (FileNotFoundError, ValueError):
+            pass
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            symbols = parse(f.read())
+        atomic_write(cache_file, json.dumps({"version": PARSER_VERSION, "symbols": symbols}))
+        return symbols
+
+    def refresh(self):
+        # Re-walk the sources; only never-seen hashes are parsed.
+        owners = {}
+        paths = {}
+        for user, name, digest, path in self._sources():
+            owners.setdefault(digest, set()).add((user, name))
+            paths[digest] = path
+        with self.lock:
+            known = set(self.symbols)
+        new_symbols = {}
+        for digest in set(owners) - known:
+            try:
+                new_symbols[digest] = self._load_symbols(digest, paths[digest])
+            except OSError:
+                continue
+        with self.lock:
+            self.symbols.update(new_symbols)
+            for digest in set(self.symbols) - set(owners):
+                del self.symbols[digest]
+            self.owners = owners
+            postings = {}
+            for digest, symbols in self.symbols.items():
+                for symbol in symbols:
+                    postings.setdefault(symbol["name"].lower(), set()).add(digest)
+            self.postings = postings
+        return len(new_symbols)
+
+    def search(self, query, kind=None, limit=100):
+        # Exact (case-insensitive) name hits first, then prefix matches.
+        # Qualified queries like `Foo.bar` match on container + name.
+        query = query.strip()
+        if not query:
+            return []
+        container_q, _, name_q = query.rpartition(".")
+        name_q = name_q.lower()
+        results = []
+        with self.lock:
+            keys = [name_q] if name_q in self.postings else []
+            keys += sorted(k for k in self.postings if k.startswith(name_q) and k != name_q)
+            for key in keys:
+                for digest in self.postings[key]:
+                    for symbol in self.symbols.get(digest, []):
+                        if symbol["name"].lower() != key or (kind and symbol["kind"] != kind):
+                            continue
+                        if container_q and not symbol["container"].lower().endswith(container_q.lower()):
+                            continue
+                        for user, file_name in sorted(self.owners.get(digest, ())):
+                            results.append(dict(symbol, user=user, file=file_name))
+                            if len(results) >= limit:
+                                return results
+        return results
+
+    def schedule(self):
+        # Ask the background thread to pick up new uploads now.
+        self.wake.set()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._loop, name="java-index", daemon=True)
+            self.thread.start()
+        return self
+
+    def _loop(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                pass
+            self.wake.wait(REFRESH_INTERVAL)
+            self.wake.clear()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index(roots=("local_backups", os.getenv("LOCAL_DIR", "local_backup"))):
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = JavaIndex(list(roots)).start()
+        return _index
@@ -0,0 +1,118 @@
+import os
+import uuid
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import rate_limit
+
+MAX_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+PER_USER_LIMIT = int(os.getenv("JOB_PER_USER_LIMIT", "2"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Job:
+    def __init__(self, user, label, fn, on_change=None, priority=rate_limit.INTERACTIVE):
+        self.id = uuid.uuid4().hex[:8]
+        self.user = user
+        self.label = label
+        self.fn = fn
+        self.on_change = on_change
+        self.priority = priority
+        self.status = QUEUED
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+
+    def _notify(self):
+        if self.on_change:
+            try:
+                self.on_change(self)
+            except Exception:
+                # A closed page/session must not kill the worker thread
+                pass
+
+    def report(self, progress):
+        self.progress = max(0.0, min(1.0, progress))
+        self._notify()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+
+class JobQueue:
+    # Shared worker pool. Each user has at most `per_user` jobs running; the
+    # rest wait in that user's FIFO so one heavy user can't starve others.
+
+    def __init__(self, max_workers=MAX_WORKERS, per_user=PER_USER_LIMIT):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.per_user = per_user
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.running = {}
+
+    def submit(self, user, label, fn, on_change=None, priority=rate_limit.INTERACTIVE):
+        # `fn(job)` does the work, may call `job.report(fraction)`, and its
+        # return value becomes `job.result`. Jobs a user is waiting on stay
+        # INTERACTIVE; pass rate_limit.BACKGROUND for bulk work (e.g. sync)
+        # that should yield GitHub budget to them.
+        job = Job(user, label, fn, on_change, priority)
+        with self.lock:
+            self.pending.setdefault(user, deque()).append(job)
+        job._notify()
+        self._dispatch(user)
+        return job
+
+    def _dispatch(self, user):
+        start = []
+        with self.lock:
+            queue = self.pending.get(user)
+            while queue and self.running.get(user, 0) < self.per_user:
+                start.append(queue.popleft())
+                self.running[user] = self.running.get(user, 0) + 1
+            if queue is not None and not queue:
+                del self.pending[user]
+        for job in start:
+            self.pool.submit(self._run, job)
+
+    def _run(self, job):
+        job.status = RUNNING
+        job._notify()
+        try:
+            with rate_limit.priority(job.priority):
+                job.result = job.fn(job)
+            job.progress = 1.0
+            job.status = DONE
+        except Exception as ex:
+            job.error = ex
+            job.status = FAILED
+        finally:
+            with self.lock:
+                self.running[job.user] -= 1
+                if not self.running[job.user]:
+                    del self.running[job.user]
+            job._notify()
+            self._dispatch(job.user)
+
+    def depth(self, user=None):
+        with self.lock:
+            if user is not None:
+                return len(self.pending.get(user, ())) + self.running.get(user, 0)
+            return sum(len(q) for q in self.pending.values()) + sum(self.running.values())
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
@@ -0,0 +1,149 @@
+import os
+import json
+import hashlib
+
+import git_data
+
+MB = 1024 * 1024
+# Above this, skip the inline Contents API and go through git blobs
+LARGE_FILE_THRESHOLD = int(os.getenv("LARGE_FILE_THRESHOLD", str(1 * MB)))
+# Above this, split into parts (GitHub rejects single blobs near 100 MB)
+SPLIT_THRESHOLD = int(os.getenv("SPLIT_THRESHOLD", str(50 * MB)))
+PART_SIZE = int(os.getenv("PART_SIZE", str(50 * MB)))
+MANIFEST_SUFFIX = ".manifest.json"
+DOWNLOAD_CHUNK = MB
+
+
+def is_large(size):
+    return size > LARGE_FILE_THRESHOLD
+
+
+def is_manifest(path):
+    return path.endswith(MANIFEST_SUFFIX)
+
+
+def original_path(manifest_path):
+    return manifest_path[:-len(MANIFEST_SUFFIX)]
+
+
+def parts_dir(repo_path):
+    return f"{repo_path}.parts"
+
+
+def _sha256(local_path):
+    h = hashlib.sha256()
+    with open(local_path, "rb") as f:
+        for chunk in iter(lambda: f.read(MB), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _plan(repo_path, local_path):
+    # -> list of (repo path, blob spec) for one file, plus its manifest
+    # document when the file is split.
+    size = os.path.getsize(local_path)
+    if size <= SPLIT_THRESHOLD:
+        return [(repo_path, local_path)], None
+    specs = []
+    for index, offset in enumerate(range(0, size, PART_SIZE)):
+        length = min(PART_SIZE, size - offset)
+        specs.append((f"{parts_dir(repo_path)}/{index:05d}", (local_path, offset, length)))
+    manifest = {
+        "name": os.path.basename(repo_path),
+        "size": size,
+        "sha256": _sha256(local_path),
+        "part_size": PART_SIZE,
+        "parts": [{"path": path, "size": spec[2]} for path, spec in specs]
+    }
+    return specs, manifest
+
+
+def upload_files(client, files, message, branch, max_workers=git_data.BLOB_WORKERS, on_progress=None):
+    # Like git_data.upload_files, but files over SPLIT_THRESHOLD become
+    # PART_SIZE blobs under `<path>.parts/` plus a `<path>.manifest.json`.
+    # Everything, parts included, lands in one commit. Returns
+    # (commit_sha, entries) where entries are the user-visible files (the
+    # manifest stands in for a split file).
+    plans = [_plan(repo_path, local_path) for repo_path, local_path in files]
+    specs = [spec for blobs, _ in plans for spec in blobs]
+    shas = git_data.create_blobs(client, [spec for _, spec in specs], max_workers, on_progress)
+    sha_by_path = {path: sha for (path, _), sha in zip(specs, shas)}
+
+    tree = [{"path": path, "mode": "100644", "type": "blob", "sha": sha} for path, sha in sha_by_path.items()]
+    visible = []
+    for (repo_path, _), (blobs, manifest) in zip(files, plans):
+        if manifest is None:
+            visible.append({"path": repo_path, "sha": sha_by_path[repo_path]})
+            continue
+        for part in manifest["parts"]:
+            part["sha"] = sha_by_path[part["path"]]
+        manifest_path = repo_path + MANIFEST_SUFFIX
+        manifest_sha = git_data.create_text_blob(client, json.dumps(manifest, indent=1))
+        entry = {"path": manifest_path, "mode": "100644", "type": "blob", "sha": manifest_sha}
+        tree.append(entry)
+        visible.append({"path": manifest_path, "sha": manifest_sha})
+    return git_data.commit_entries(client, tree, message, branch), visible
+
+
+def read_manifest(client, manifest_path, branch):
+    r = client.get(client.contents_url(manifest_path), params={"ref": branch},
+                   headers={"Accept": "application/vnd.github.raw"})
+    if r.status_code != 200:
+        raise git_data.GitDataError("get manifest", r)
+    return json.loads(r.content)
+
+
+def expand_paths(client, paths, branch):
+    # Deleting a split file must also delete its parts.
+    expanded = []
+    for path in paths:
+        expanded.append(path)
+        if is_manifest(path):
+            try:
+                manifest = read_manifest(client, path, branch)
+            except git_data.GitDataError:
+                continue
+            expanded.extend(part["path"] for part in manifest.get("parts", []))
+    return expanded
+
+
+def _fetch_blob(client, sha, out, h):
+    r = client.get(f"git/blobs/{sha}", headers={"Accept": "application/vnd.github.raw"}, stream=True)
+    if r.status_code != 200:
+        raise git_data.GitDataError("get blob", r)
+    with r:
+        for chunk in r.iter_content(DOWNLOAD_CHUNK):
+            h.update(chunk)
+            out.write(chunk)
+
+
+def download(client, repo_path, branch, dest_path, on_progress=None):
+    # Reassemble a split file from its manifest (or fetch a plain blob-sized
+    # file) into `dest_path`, streaming part by part and verifying sha256.
+    manifest = read_manifest(client, repo_path, branch) if is_manifest(repo_path) else None
+    h = hashlib.sha256()
+    tmp = dest_path + ".part"
+    try:
+        with open(tmp, "wb") as out:
+            if manifest is None:
+                r = client.get(client.contents_url(repo_path), params={"ref": branch},
+                               headers={"Accept": "application/vnd.github.raw"}, stream=True)
+                if r.status_code != 200:
+                    raise git_data.GitDataError("get file", r)
+                with r:
+                    for chunk in r.iter_content(DOWNLOAD_CHUNK):
+                        out.write(chunk)
+            else:
+                parts = manifest["parts"]
+                for index, part in enumerate(parts):
+                    _fetch_blob(client, part["sha"], out, h)
+                    if on_progress:
+                        on_progress((index + 1) / len(parts))
+        if manifest is not None and h.hexdigest() != manifest["sha256"]:
+            raise ValueError(f"Checksum mismatch reassembling {repo_path}")
+        os.replace(tmp, dest_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return dest_path
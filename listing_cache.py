@@ -0,0 +1,90 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+TTL = float(os.getenv("LISTING_CACHE_TTL", "30"))
+MAX_ENTRIES = int(os.getenv("LISTING_CACHE_SIZE", "256"))
+
+
+class ListingCache:
+    # Directory listings keyed by (owner, repo, path, branch). Within the TTL
+    # an entry is served without any request; after that it is revalidated
+    # with If-None-Match, and GitHub's 304 replies don't count against the
+    # rate limit. Least-recently-used entries are evicted past `max_entries`.
+
+    def __init__(self, ttl=TTL, max_entries=MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def _key(self, client, path, branch):
+        return (client.owner, client.repo, path.strip("/"), branch)
+
+    def get(self, client, path, branch):
+        # Returns (status_code, items). 404 is cached too (empty folder).
+        key = self._key(client, path, branch)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry:
+                self.entries.move_to_end(key)
+                if time.monotonic() - entry["checked"] < self.ttl:
+                    return entry["status"], entry["items"]
+
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        r = client.get(client.contents_url(path), params={"ref": branch}, headers=headers)
+
+        if r.status_code == 304 and entry:
+            status, items, etag = entry["status"], entry["items"], entry["etag"]
+        elif r.status_code == 200:
+            status, items, etag = 200, r.json(), r.headers.get("ETag")
+        elif r.status_code == 404:
+            status, items, etag = 404, [], None
+        else:
+            # Don't cache transient failures
+            return r.status_code, []
+
+        with self.lock:
+            self.entries[key] = {"status": status, "items": items, "etag": etag, "checked": time.monotonic()}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return status, items
+
+    def file_sha(self, client, path, branch):
+        # Remote blob SHA of a single file, answered from its folder's cached
+        # listing. None if the file (or folder) doesn't exist.
+        parent = path.strip("/").rpartition("/")[0]
+        status, items = self.get(client, parent, branch)
+        if status != 200:
+            return None
+        for item in items:
+            if item.get("path") == path.strip("/"):
+                return item.get("sha")
+        return None
+
+    def invalidate(self, client, path, branch):
+        # Drop the listing for `path` and any cached ancestor/descendant
+        # folder, since a write under it changes their contents.
+        path = path.strip("/")
+        with self.lock:
+            for key in list(self.entries):
+                if key[:2] != (client.owner, client.repo) or key[3] != branch:
+                    continue
+                cached = key[2]
+                if cached == path or path.startswith(cached + "/") or cached.startswith(path + "/") or not cached:
+                    del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_cache = ListingCache()
+
+
+def get_cache():
+    return _cache
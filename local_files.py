@@ -0,0 +1,37 @@
+import os
+import base64
+from datetime import datetime
+
+PAGE_SIZE = int(os.getenv("LOCAL_PAGE_SIZE", "50"))
+
+
+def page_count(total, per_page=PAGE_SIZE):
+    return max(1, (total + per_page - 1) // per_page)
+
+
+def page_slice(entries, page, per_page=PAGE_SIZE):
+    page = min(max(page, 0), page_count(len(entries), per_page) - 1)
+    start = page * per_page
+    return page, entries[start:start + per_page]
+
+
+def human_size(size):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def describe(entry):
+    when = datetime.fromtimestamp(entry["mtime"]).strftime("%Y-%m-%d %H:%M")
+    text = f"{human_size(entry['size'])} · {when}"
+    if entry.get("versions", 1) > 1:
+        text += f" · {entry['versions']} versions"
+    return text
+
+
+def data_url(path):
+    # Read on demand when the user actually clicks Download.
+    with open(path, "rb") as f:
+        return f"data:application/octet-stream;base64,{base64.b64encode(f.read()).decode()}"
+
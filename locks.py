@@ -0,0 +1,59 @@
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(path):
+    key = os.path.abspath(path)
+    with _thread_locks_guard:
+        lock = _thread_locks.get(key)
+        if lock is None:
+            lock = _thread_locks[key] = threading.RLock()
+        return lock
+
+
+@contextmanager
+def locked(path):
+    # Serialise writers to `path` across threads (Flet/Streamlit sessions) and
+    # across worker processes via an advisory lock on a sidecar `.lock` file.
+    with _thread_lock(path):
+        if fcntl is None:
+            yield
+            return
+        lock_dir = os.path.dirname(os.path.abspath(path))
+        os.makedirs(lock_dir, exist_ok=True)
+        with open(path + ".lock", "a") as lf:
+            fcntl.flock(lf.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lf.fileno(), fcntl.LOCK_UN)
+
+
+def atomic_write(path, data, fsync=False):
+    # Write to a temp file in the same directory, then rename over `path`, so
+    # readers never see a half-written file.
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    mode = "wb" if isinstance(data, bytes) else "w"
+    kwargs = {} if mode == "wb" else {"newline": "", "encoding": "utf-8"}
+    try:
+        with open(tmp, mode, **kwargs) as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
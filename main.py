@@ -1,12 +1,24 @@
 import flet as ft
 import os
-import csv
-import base64
+import re
 import uuid
-import requests
+import tempfile
 from datetime import datetime
 from dotenv import load_dotenv
 
+import user_store
+from github_client import get_client
+from streaming import JSONFileBody
+import blob_store
+import git_data
+import large_files
+import repo_tree
+import rate_limit
+import text_index
+import sync
+import jobs
+import local_files
+
 load_dotenv()
 
 # Env config
@@ -15,65 +27,194 @@ REPO_OWNER = os.getenv("REPO_OWNER")
 REPO_NAME = os.getenv("REPO_NAME")
 BRANCH = os.getenv("BRANCH", "main")
 USERS_CSV = os.getenv("USERS_CSV", "users.csv")
+# Optional older user list to fold into USERS_CSV (renamed *.migrated after)
+LEGACY_USERS_CSV = os.getenv("LEGACY_USERS_CSV")
 LOCAL_DIR = os.getenv("LOCAL_DIR", "local_backup")
+MAX_JOB_ROWS = 10
 
 os.makedirs(LOCAL_DIR, exist_ok=True)
-if not os.path.exists(USERS_CSV):
-    with open(USERS_CSV, "w", newline='') as f:
-        csv.writer(f).writerow(["username", "password", "recovery_hint"])
+user_store.ensure_store(USERS_CSV)
+if LEGACY_USERS_CSV and os.path.exists(LEGACY_USERS_CSV):
+    user_store.migrate_csv(LEGACY_USERS_CSV, USERS_CSV)
+# Fold pre-blob-store per-user folders into the store, once per LOCAL_DIR
+blob_store.migrate_legacy(LOCAL_DIR)
+search_index = text_index.get_index([LOCAL_DIR])
+github = get_client(GITHUB_TOKEN, REPO_OWNER, REPO_NAME, BRANCH)
 
 
 def load_users():
-    users = {}
-    with open(USERS_CSV, "r") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            users[row["username"]] = {
-                "password": row["password"],
-                "recovery_hint": row["recovery_hint"]
-            }
-    return users
+    return user_store.all_users(USERS_CSV)
 
 def save_user(username, password, hint):
-    with open(USERS_CSV, "a", newline='') as f:
-        csv.writer(f).writerow([username, password, hint])
+    return user_store.add_user(USERS_CSV, username, password, hint)
 
-def save_to_github(user, file_name, content_bytes, target_path="saving"):
+def upload_dir(user, target_path="saving"):
+    return f"{target_path}/{user}/uploads"
+
+def upload_path(user, file_name, target_path="saving"):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     unique_id = uuid.uuid4().hex[:6]
-    path = f"{target_path}/{user}/uploads/{timestamp}_{unique_id}_{file_name}"
-    url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents/{path}"
-    encoded = base64.b64encode(content_bytes).decode("utf-8")
+    return f"{upload_dir(user, target_path)}/{timestamp}_{unique_id}_{file_name}"
 
-    payload = {
-        "message": f"Upload by {user}",
-        "content": encoded,
-        "branch": BRANCH
-    }
+UPLOAD_PREFIX = re.compile(r"^\d{8}_\d{6}_[0-9a-f]{6}_")
+
+def upload_name(path):
+    # The original file name of an upload_path(): "<ts>_<id>_foo.txt" -> "foo.txt"
+    return UPLOAD_PREFIX.sub("", os.path.basename(path))
 
-    headers = {
-        "Authorization": f"Bearer {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json"
+def github_item(path, sha):
+    # Same shape as a Contents API listing entry, for rows we add ourselves.
+    return {
+        "name": path.rsplit("/", 1)[-1],
+        "path": path,
+        "sha": sha,
+        "html_url": f"https://github.com/{REPO_OWNER}/{REPO_NAME}/blob/{BRANCH}/{path}"
     }
 
-    response = requests.put(url, json=payload, headers=headers)
+def save_to_github(user, file_name, file_path, target_path="saving", on_progress=None):
+    path = upload_path(user, file_name, target_path)
+    if large_files.is_large(os.path.getsize(file_path)):
+        # Past the inline Contents API sweet spot: git blobs (split if huge)
+        success, result = save_batch_to_github(user, [(file_name, file_path)], target_path,
+                                               on_progress=on_progress, paths=[path])
+        return success, result[0] if success else result
+    url = github.contents_url(path)
+
+    # Stream the file from disk through an incremental base64 encoder straight
+    # into the request body, so memory stays flat regardless of file size.
+    body = JSONFileBody({
+        "message": f"Upload by {user}",
+        "branch": BRANCH
+    }, file_path, on_progress=on_progress)
+
+    response = github.put(url, data=body, headers={"Content-Type": "application/json"})
     if response.status_code in [200, 201]:
-        return True, response.json()["content"]["path"]
+        return True, response.json()["content"]
     else:
         return False, response.json()
 
+def save_batch_to_github(user, files, target_path="saving", on_progress=None, paths=None):
+    # `files` is a list of (file_name, local_path). Blobs are created in
+    # parallel and all files land in a single commit; very large files are
+    # split into parts with a manifest.
+    paths = paths or [upload_path(user, name, target_path) for name, _ in files]
+    entries = [(path, local) for path, (_, local) in zip(paths, files)]
+    try:
+        _, tree = large_files.upload_files(github, entries, f"Upload {len(entries)} files by {user}", BRANCH,
+                                on_progress=on_progress)
+    except git_data.GitDataError as ex:
+        return False, ex.detail
+    return True, [github_item(entry["path"], entry["sha"]) for entry in tree]
+
+def delete_from_github(user, path, sha=None):
+    # Reuse the blob SHA from the listing; only fall back to a GET when we
+    # don't have one or it turned out to be stale (409/422).
+    if large_files.is_manifest(path):
+        return delete_batch_from_github(user, [path])
+    url = github.contents_url(path)
+    for attempt in range(2):
+        if not sha:
+            get_resp = github.get(url, params={"ref": BRANCH})
+            if get_resp.status_code != 200:
+                return False, "File not found on GitHub."
+            sha = get_resp.json()["sha"]
+        delete_resp = github.delete(url, json={
+            "message": f"Delete by {user}",
+            "sha": sha,
+            "branch": BRANCH
+        })
+        if delete_resp.status_code not in (409, 422):
+            break
+        sha = None
+    if delete_resp.status_code == 200:
+        return True, f"✅ Deleted from GitHub: {path}"
+    return False, "❌ GitHub deletion failed"
+
+def delete_batch_from_github(user, paths):
+    # N files, one commit, no per-file SHA lookups.
+    paths = large_files.expand_paths(github, paths, BRANCH)
+    try:
+        git_data.delete_paths(github, paths, f"Delete {len(paths)} files by {user}", BRANCH)
+    except git_data.GitDataError as ex:
+        return False, f"❌ GitHub deletion failed: {ex.detail}"
+    return True, f"✅ Deleted {len(paths)} files from GitHub"
+
+def restore_from_github(user, path, on_progress=None):
+    # Download (reassembling split files) into the user's local store.
+    name = upload_name(large_files.original_path(path) if large_files.is_manifest(path) else path)
+    fd, tmp = tempfile.mkstemp(dir=LOCAL_DIR, prefix=".restore-")
+    os.close(fd)
+    try:
+        large_files.download(github, path, BRANCH, tmp, on_progress=on_progress)
+        blob_store.put(LOCAL_DIR, user, name, tmp)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return name
+
 
 def main(page: ft.Page):
     page.title = "Flet File Saver"
     page.scroll = "auto"
 
-    users = load_users()
     github_path = ft.TextField(label="GitHub Folder Path", value="saving", expand=True)
     message = ft.Text()
     current_user = {"name": None}
+    job_queue = jobs.get_queue()
+    jobs_view = ft.Column()
+    job_rows = {}
+    api_budget = ft.Text(size=12)
+
+    def show_budget():
+        info = rate_limit.get_scheduler().status()
+        queued = info["queued_interactive"] + info["queued_background"]
+        budget = f"{info['remaining']}/{info['limit']}" if info["remaining"] is not None else "unknown"
+        api_budget.value = f"GitHub API budget: {budget} · waiting: {queued} · jobs: {job_queue.depth()}"
+        if info["blocked_for"]:
+            api_budget.value += f" · paused {int(info['blocked_for'])}s"
+
+    def show_job(job):
+        # Called from worker threads; only touches this job's row.
+        row = job_rows.get(job.id)
+        if row is None:
+            row = job_rows[job.id] = {
+                "job": job,
+                "text": ft.Text(expand=1),
+                "bar": ft.ProgressBar(width=200, value=0)
+            }
+            row["control"] = ft.Row([row["text"], row["bar"]])
+            jobs_view.controls.append(row["control"])
+            # Keep the panel short: drop the oldest finished jobs
+            for old_id, old in list(job_rows.items()):
+                if len(job_rows) <= MAX_JOB_ROWS:
+                    break
+                if old["job"].finished:
+                    jobs_view.controls.remove(old["control"])
+                    del job_rows[old_id]
+        status = job.status
+        if job.status == jobs.FAILED:
+            status = f"failed: {job.error}"
+        row["text"].value = f"{job.label} — {status}"
+        row["bar"].value = job.progress
+        show_budget()
+        if jobs_view.page:
+            jobs_view.update()
+            api_budget.update()
+
+    def run_job(user, label, fn, on_done, priority=rate_limit.INTERACTIVE):
+        # Run `fn(job)` off the event handler; `on_done(job)` runs in the
+        # worker once it finishes, if the same user is still logged in.
+        def on_change(job):
+            show_job(job)
+            if job.finished and current_user["name"] == user:
+                on_done(job)
+
+        return job_queue.submit(user, label, fn, on_change, priority)
 
     def logout():
         current_user["name"] = None
+        jobs_view.controls.clear()
+        job_rows.clear()
         page.session.clear()
         page.clean()
         login_register_ui()
@@ -91,7 +232,7 @@ def main(page: ft.Page):
 
         def do_login(e):
             u, p = login_username.value, login_password.value
-            if u in users and users[u]["password"] == p:
+            if blob_store.valid_user(u) and user_store.check_login(USERS_CSV, u, p):
                 current_user["name"] = u
                 page.clean()
                 app_ui(u)
@@ -103,10 +244,11 @@ def main(page: ft.Page):
             u, p, h = register_username.value, register_password.value, register_hint.value
             if not u or not p or not h:
                 register_msg.value = "⚠️ Fill all fields"
-            elif u in users:
+            elif not blob_store.valid_user(u):
+                register_msg.value = "⚠️ Username can't start with '.' or contain '/' or '\\'"
+            elif not save_user(u, p, h):
                 register_msg.value = "⚠️ Username already exists"
             else:
-                save_user(u, p, h)
                 register_msg.value = "✅ Registered! Now login."
             page.update()
 
@@ -140,105 +282,289 @@ def main(page: ft.Page):
     def app_ui(user):
         page.clean()
 
-        # State for the selected file
-        selected_file = {"name": None, "path": None, "bytes": None}
+        # View model: the file lists live in memory for the whole session and
+        # every action patches them (and their Column) in place instead of
+        # rebuilding the page.
+        selected_files = []  # list of {"name", "path"}
+        local_entries = blob_store.list_files(LOCAL_DIR, user)
+        local_pager = {"page": 0}
+        local_list = ft.Column()
+        github_files = []
+        github_selected = {}
+        github_list = ft.Column()
+        delete_selected_btn = ft.ElevatedButton(
+            "🗑️ Delete Selected",
+            on_click=lambda e: delete_github_files(list(github_selected.items()))
+        )
+
+        def github_folder():
+            return f"{github_path.value.strip().strip('/')}/{user}/uploads"
+
+        def notify(text):
+            message.value = text
+            if message.page:
+                message.update()
 
         def file_picker_result(e: ft.FilePickerResultEvent):
+            # Only remember paths; contents are streamed at upload time.
+            selected_files.clear()
             if e.files:
-                file = e.files[0]
-                selected_file["name"] = file.name
-                selected_file["path"] = file.path
-                try:
-                    with open(file.path, "rb") as f:
-                        selected_file["bytes"] = f.read()
-                    message.value = f"Selected file: {file.name}"
-                except Exception as ex:
-                    selected_file["bytes"] = None
-                    message.value = f"Error reading file: {ex}"
+                unreadable = []
+                for file in e.files:
+                    if file.path and os.path.isfile(file.path):
+                        selected_files.append({"name": file.name, "path": file.path})
+                    else:
+                        unreadable.append(file.name)
+                if unreadable:
+                    notify(f"Error reading file: {', '.join(unreadable)}")
+                elif len(selected_files) == 1:
+                    notify(f"Selected file: {selected_files[0]['name']}")
+                else:
+                    notify(f"Selected {len(selected_files)} files")
             else:
-                selected_file["name"] = None
-                selected_file["path"] = None
-                selected_file["bytes"] = None
-                message.value = "No file selected!"
-            page.update()
+                notify("No file selected!")
+
+        # --- Local files ---
+
+        def download_local(path):
+            try:
+                page.launch_url(local_files.data_url(path))
+            except Exception as ex:
+                notify(f"Error reading file: {ex}")
+
+        def render_local(delta=0):
+            if not local_entries:
+                local_list.controls = [ft.Text("No local files found.")]
+            else:
+                local_pager["page"], visible = local_files.page_slice(local_entries, local_pager["page"] + delta)
+                pages = local_files.page_count(len(local_entries))
+                local_list.controls = [
+                    ft.Row([
+                        ft.Text(entry["name"], expand=1),
+                        ft.Text(local_files.describe(entry)),
+                        ft.ElevatedButton("⬇️ Download", on_click=lambda e, p=entry["path"]: download_local(p)),
+                        ft.IconButton(icon=ft.icons.DELETE, on_click=lambda e, n=entry["name"]: delete_local(n))
+                    ])
+                    for entry in visible
+                ]
+                if pages > 1:
+                    local_list.controls.append(ft.Row([
+                        ft.TextButton("◀ Prev", on_click=lambda e: render_local(-1), disabled=local_pager["page"] == 0),
+                        ft.Text(f"Page {local_pager['page'] + 1} of {pages} ({len(local_entries)} files)"),
+                        ft.TextButton("Next ▶", on_click=lambda e: render_local(1), disabled=local_pager["page"] >= pages - 1)
+                    ]))
+            if local_list.page:
+                local_list.update()
 
         def upload_local(e):
-            if not selected_file["bytes"]:
-                message.value = "No file selected!"
-                page.update()
+            if not selected_files:
+                notify("No file selected!")
                 return
-            user_dir = os.path.join(LOCAL_DIR, user)
-            os.makedirs(user_dir, exist_ok=True)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            local_name = f"{timestamp}_{selected_file['name']}"
-            local_path = os.path.join(user_dir, local_name)
-            with open(local_path, "wb") as f:
-                f.write(selected_file["bytes"])
-            message.value = f"✅ File saved locally: {local_name}"
-            app_ui(user)  # Refresh UI
-
-        def upload_github(e):
-            if not selected_file["bytes"]:
-                message.value = "No file selected!"
-                page.update()
+            saved = []
+            unchanged = []
+            for file in selected_files:
+                _, created = blob_store.put(LOCAL_DIR, user, file["name"], file["path"])
+                (saved if created else unchanged).append(file["name"])
+            # One manifest read, no directory scan
+            local_entries[:] = blob_store.list_files(LOCAL_DIR, user)
+            message.value = f"✅ File saved locally: {', '.join(saved)}" if saved else ""
+            if unchanged:
+                message.value += f"{' · ' if saved else ''}Unchanged: {', '.join(unchanged)}"
+            render_local()
+            message.update()
+
+        def delete_local(name):
+            try:
+                blob_store.delete(LOCAL_DIR, user, name)
+            except Exception as ex:
+                notify(f"Error deleting: {ex}")
                 return
-            success, result = save_to_github(user, selected_file["name"], selected_file["bytes"], github_path.value)
-            if success:
-                message.value = f"✅ Uploaded to GitHub: {result}"
+            local_entries[:] = [entry for entry in local_entries if entry["name"] != name]
+            message.value = f"🗑️ Deleted: {name}"
+            render_local()
+            message.update()
+
+        # --- Search (inverted index kept current by blob_store events) ---
+
+        search_box = ft.TextField(label="Search your local files", expand=True)
+        search_results = ft.Column()
+
+        def run_search(e=None):
+            hits = search_index.search(search_box.value or "", user=user)
+            if not search_box.value:
+                search_results.controls = []
+            elif not hits:
+                search_results.controls = [ft.Text("No matches.")]
             else:
-                message.value = f"❌ GitHub error: {result}"
-            app_ui(user)  # Refresh UI
-
-        def list_github_files():
-            url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents/{github_path.value}/{user}/uploads"
-            headers = {
-                "Authorization": f"Bearer {GITHUB_TOKEN}",
-                "Accept": "application/vnd.github.v3+json"
-            }
-            r = requests.get(url, headers=headers)
-            if r.status_code == 200:
-                return r.json()
-            return []
-
-        def delete_github_file(path):
-            url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents/{path}"
-            headers = {
-                "Authorization": f"Bearer {GITHUB_TOKEN}",
-                "Accept": "application/vnd.github.v3+json"
-            }
-            get_resp = requests.get(url, headers=headers)
-            if get_resp.status_code != 200:
-                message.value = "File not found on GitHub."
-                page.update()
+                search_results.controls = [
+                    ft.Row([
+                        ft.Text(hit["file"], weight="bold"),
+                        ft.Text(f"line {hit['line']}: {hit['snippet']}" if hit.get("line") else "", expand=1),
+                        ft.ElevatedButton("⬇️ Download", on_click=lambda e, p=hit["path"]: download_local(p))
+                    ])
+                    for hit in hits
+                ]
+            search_results.update()
+
+        search_box.on_submit = run_search
+
+        # --- GitHub files ---
+
+        def github_row(f):
+            return ft.Row([
+                ft.Checkbox(on_change=lambda e, f=f: toggle_github(e, f)),
+                ft.Text(f["name"], expand=1),
+                ft.TextButton("🌐 Open", url=f["html_url"]),
+                ft.TextButton("⬇️ Restore", on_click=lambda e, f=f: restore_github_file(f["path"])),
+                ft.IconButton(icon=ft.icons.DELETE, on_click=lambda e, f=f: delete_github_files([(f["path"], f["sha"])]))
+            ], data=f["path"])
+
+        def render_github():
+            github_list.controls = [github_row(f) for f in github_files] or [ft.Text("No GitHub files found.")]
+            delete_selected_btn.visible = bool(github_files)
+            if github_list.page:
+                github_list.update()
+                delete_selected_btn.update()
+
+        def load_github(e=None):
+            try:
+                github_files[:] = repo_tree.get_tree().list_dir(github, BRANCH, github_folder())
+            except (git_data.GitDataError, rate_limit.RateLimitExceeded) as ex:
+                github_files[:] = []
+                notify(f"❌ Could not list GitHub files: {ex}")
+            github_selected.clear()
+            render_github()
+
+        def toggle_github(e, f):
+            if e.control.value:
+                github_selected[f["path"]] = f["sha"]
+            else:
+                github_selected.pop(f["path"], None)
+
+        def add_github_rows(items):
+            # Only rows for the folder currently shown; others just stay cached.
+            folder = github_folder()
+            new = [f for f in items if f["path"].rsplit("/", 1)[0] == folder]
+            if not new:
                 return
-            sha = get_resp.json()["sha"]
-            delete_payload = {
-                "message": f"Delete by {user}",
-                "sha": sha,
-                "branch": BRANCH
-            }
-            delete_resp = requests.delete(url, json=delete_payload, headers=headers)
-            if delete_resp.status_code == 200:
-                message.value = f"✅ Deleted from GitHub: {path}"
-                app_ui(user)
+            if not github_files:
+                github_list.controls.clear()
+            for f in new:
+                github_files.append(f)
+                github_list.controls.append(github_row(f))
+            delete_selected_btn.visible = True
+            github_list.update()
+            delete_selected_btn.update()
+
+        def remove_github_rows(paths):
+            paths = set(paths)
+            github_files[:] = [f for f in github_files if f["path"] not in paths]
+            for path in paths:
+                github_selected.pop(path, None)
+            github_list.controls = [c for c in github_list.controls if c.data not in paths]
+            if not github_files:
+                render_github()
             else:
-                message.value = f"❌ GitHub deletion failed"
-            page.update()
+                github_list.update()
 
-        def delete_local(path):
-            try:
-                os.remove(path)
-                message.value = f"🗑️ Deleted: {os.path.basename(path)}"
-                app_ui(user)
-            except Exception as ex:
-                message.value = f"Error deleting: {ex}"
-            page.update()
+        def upload_github(e):
+            if not selected_files:
+                notify("No file selected!")
+                return
+            files = [(f["name"], f["path"]) for f in selected_files]
+            target = github_path.value
+
+            def work(job):
+                if len(files) == 1:
+                    success, result = save_to_github(user, files[0][0], files[0][1], target, on_progress=job.report)
+                    return success, [result] if success else result
+                return save_batch_to_github(user, files, target, on_progress=job.report)
+
+            def done(job):
+                success, result = job.result if job.result else (False, job.error)
+                if success:
+                    if len(result) == 1:
+                        message.value = f"✅ Uploaded to GitHub: {result[0]['path']}"
+                    else:
+                        message.value = f"✅ Uploaded to GitHub: {len(result)} files in one commit"
+                    add_github_rows(result)
+                else:
+                    message.value = f"❌ GitHub error: {result}"
+                message.update()
+
+            label = files[0][0] if len(files) == 1 else f"{len(files)} files"
+            run_job(user, f"⬆️ {label}", work, done)
+            notify(f"Queued upload: {label}")
+
+        def delete_github_files(items):
+            # `items` is a list of (path, sha) taken from the listing.
+            if not items:
+                notify("No GitHub files selected!")
+                return
+
+            def work(job):
+                if len(items) == 1:
+                    return delete_from_github(user, items[0][0], items[0][1])
+                return delete_batch_from_github(user, [path for path, _ in items])
+
+            def done(job):
+                success, text = job.result if job.result else (False, f"❌ GitHub deletion failed: {job.error}")
+                message.value = text
+                if success:
+                    remove_github_rows([path for path, _ in items])
+                message.update()
+
+            label = os.path.basename(items[0][0]) if len(items) == 1 else f"{len(items)} files"
+            run_job(user, f"🗑️ {label}", work, done)
+
+        def restore_github_file(path):
+            def done(job):
+                if job.status == jobs.DONE:
+                    local_entries[:] = blob_store.list_files(LOCAL_DIR, user)
+                    message.value = f"✅ Restored to local: {job.result}"
+                    render_local()
+                else:
+                    message.value = f"❌ Restore failed: {job.error}"
+                message.update()
+
+            run_job(user, f"⬇️ {os.path.basename(path)}",
+                    lambda job: restore_from_github(user, path, on_progress=job.report), done)
+
+        def run_sync(dry_run):
+            def work(job):
+                # Reconcile with the upload folder listed above: remote uploads
+                # are matched by their original name, pushes are named like uploads
+                target = github_path.value.strip().strip('/')
+                return sync.sync(github, BRANCH, LOCAL_DIR, user, dry_run=dry_run,
+                                 on_progress=job.report, prefix=github_folder(),
+                                 local_name=upload_name,
+                                 remote_path=lambda name: upload_path(user, name, target))
+
+            def done(job):
+                if job.status != jobs.DONE:
+                    message.value = f"❌ Sync failed: {job.error}"
+                elif dry_run:
+                    message.value = f"🔍 Sync preview: {sync.describe(job.result)}"
+                else:
+                    message.value = f"✅ Synced: {sync.describe(job.result)}"
+                    local_entries[:] = blob_store.list_files(LOCAL_DIR, user)
+                    render_local()
+                message.update()
+
+            # A full sync is bulk work and yields budget to the user's clicks
+            run_job(user, "🔄 sync preview" if dry_run else "🔄 sync", work, done,
+                    rate_limit.INTERACTIVE if dry_run else rate_limit.BACKGROUND)
 
         # Setup FilePicker and add to overlay once
         upload_picker = ft.FilePicker(on_result=file_picker_result)
         if upload_picker not in page.overlay:
             page.overlay.append(upload_picker)
 
+        github_path.on_submit = load_github
+        render_local()
+        load_github()
+        show_budget()
+
         page.add(
             ft.Row([
                 ft.Text(f"📋 Logged in as: {user}", expand=1),
@@ -246,46 +572,29 @@ def main(page: ft.Page):
             ]),
             github_path,
             ft.Row([
-                ft.ElevatedButton("📂 Select File", on_click=lambda _: upload_picker.pick_files()),
+                ft.ElevatedButton("📂 Select Files", on_click=lambda _: upload_picker.pick_files(allow_multiple=True)),
                 ft.ElevatedButton("⬆️ Upload to Local", on_click=upload_local),
                 ft.ElevatedButton("☁️ Upload to GitHub", on_click=upload_github)
             ]),
             message,
+            api_budget,
+            jobs_view,
+            ft.Divider(),
+            ft.Text("📁 Local Files", size=20, weight="bold"),
+            ft.Row([search_box, ft.IconButton(icon=ft.icons.SEARCH, on_click=run_search)]),
+            search_results,
+            local_list,
             ft.Divider(),
-            ft.Text("📁 Local Files", size=20, weight="bold")
+            ft.Row([
+                ft.Text("☁️ GitHub Files", size=20, weight="bold", expand=1),
+                ft.TextButton("🔄 Refresh", on_click=load_github),
+                ft.TextButton("🔍 Sync Preview", on_click=lambda e: run_sync(True)),
+                ft.TextButton("🔁 Sync Local ⇄ GitHub", on_click=lambda e: run_sync(False))
+            ]),
+            delete_selected_btn,
+            github_list
         )
 
-        # List local files
-        user_dir = os.path.join(LOCAL_DIR, user)
-        if os.path.exists(user_dir):
-            files = sorted(os.listdir(user_dir))
-            for file in files:
-                fpath = os.path.join(user_dir, file)
-                with open(fpath, "rb") as f:
-                    data = f.read()
-                row = ft.Row([
-                    ft.Text(file, expand=1),
-                    ft.ElevatedButton("⬇️ Download", on_click=lambda e, d=data: page.launch_url(f"data:application/octet-stream;base64,{base64.b64encode(d).decode()}")),
-                    ft.IconButton(icon=ft.icons.DELETE, on_click=lambda e, p=fpath: delete_local(p))
-                ])
-                page.add(row)
-        else:
-            page.add(ft.Text("No local files found."))
-
-        # GitHub Files
-        page.add(ft.Divider(), ft.Text("☁️ GitHub Files", size=20, weight="bold"))
-        github_files = list_github_files()
-        if github_files:
-            for f in github_files:
-                row = ft.Row([
-                    ft.Text(f["name"], expand=1),
-                    ft.TextButton("🌐 Open", url=f["html_url"]),
-                    ft.IconButton(icon=ft.icons.DELETE, on_click=lambda e, p=f["path"]: delete_github_file(p))
-                ])
-                page.add(row)
-        else:
-            page.add(ft.Text("No GitHub files found."))
-
     login_register_ui()
 
 ft.app(target=main)
@@ -0,0 +1,149 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Requests left in the window that only interactive calls may use
+BACKGROUND_RESERVE = int(os.getenv("GITHUB_BACKGROUND_RESERVE", "200"))
+# Secondary limit allows ~80 content-creating requests a minute; spacing the
+# start of each write keeps us under it while parallel uploads still overlap
+WRITE_INTERVAL = float(os.getenv("GITHUB_WRITE_INTERVAL", "0.75"))
+# Fallback wait for a secondary limit without Retry-After
+SECONDARY_BACKOFF = float(os.getenv("GITHUB_SECONDARY_BACKOFF", "60"))
+# Longest a call may be held before failing fast (an interactive click
+# shouldn't hang for minutes; queued background work can)
+MAX_WAIT = {
+    INTERACTIVE: float(os.getenv("GITHUB_MAX_RATE_WAIT", "10")),
+    BACKGROUND: float(os.getenv("GITHUB_MAX_BACKGROUND_RATE_WAIT", "900"))
+}
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+_local = threading.local()
+
+
+def current_priority():
+    return getattr(_local, "priority", INTERACTIVE)
+
+
+@contextmanager
+def priority(level):
+    # Mark every GitHub call made by this thread inside the block.
+    previous = current_priority()
+    _local.priority = level
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class RequestScheduler:
+    # Tracks the token's budget from X-RateLimit-* headers and gates each
+    # request: background work stops at BACKGROUND_RESERVE and yields to
+    # waiting interactive calls, writes are spaced WRITE_INTERVAL apart, and
+    # everyone waits out Retry-After / reset after a 403/429.
+
+    def __init__(self, background_reserve=BACKGROUND_RESERVE, write_interval=WRITE_INTERVAL):
+        self.background_reserve = background_reserve
+        self.write_interval = write_interval
+        self.cond = threading.Condition()
+        self.limit = None
+        self.remaining = None
+        self.reset_at = 0.0
+        self.blocked_until = 0.0
+        self.last_write = 0.0
+        self.waiting = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.in_flight = 0
+
+    def _delay(self, level, is_write, now):
+        delay = self.blocked_until - now
+        if self.remaining is not None and now < self.reset_at:
+            reserve = self.background_reserve if level == BACKGROUND else 0
+            if self.remaining <= reserve:
+                delay = max(delay, self.reset_at - now)
+        if level == BACKGROUND and self.waiting[INTERACTIVE]:
+            delay = max(delay, 0.05)
+        if is_write:
+            delay = max(delay, self.last_write + self.write_interval - now)
+        return delay
+
+    def acquire(self, method, level=None):
+        level = current_priority() if level is None else level
+        is_write = method.upper() in WRITE_METHODS
+        deadline = time.time() + MAX_WAIT[level]
+        with self.cond:
+            self.waiting[level] += 1
+            try:
+                while True:
+                    now = time.time()
+                    delay = self._delay(level, is_write, now)
+                    if delay <= 0:
+                        break
+                    if now + delay > deadline:
+                        raise RateLimitExceeded(f"GitHub rate limit: retry in {int(delay)}s")
+                    self.cond.wait(min(delay, 1.0))
+                if is_write:
+                    self.last_write = now
+                if self.remaining is not None:
+                    self.remaining -= 1
+                self.in_flight += 1
+            finally:
+                self.waiting[level] -= 1
+                self.cond.notify_all()
+
+    def record(self, response):
+        # Update the budget from a response; True if it was rate limited and
+        # the request should be retried once the block lifts.
+        headers = response.headers
+        now = time.time()
+        limited = False
+        with self.cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            if "X-RateLimit-Remaining" in headers:
+                self.remaining = int(headers["X-RateLimit-Remaining"])
+                self.limit = int(headers.get("X-RateLimit-Limit", self.limit or 0))
+                self.reset_at = float(headers.get("X-RateLimit-Reset", self.reset_at))
+            if response.status_code in (403, 429):
+                retry_after = headers.get("Retry-After")
+                if retry_after:
+                    self.blocked_until = max(self.blocked_until, now + float(retry_after))
+                    limited = True
+                elif self.remaining == 0:
+                    self.blocked_until = max(self.blocked_until, self.reset_at)
+                    limited = True
+                elif response.status_code == 429 or "rate limit" in response.text.lower():
+                    self.blocked_until = max(self.blocked_until, now + SECONDARY_BACKOFF)
+                    limited = True
+            self.cond.notify_all()
+        return limited
+
+    def release(self):
+        # Request failed before a response arrived
+        with self.cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.cond.notify_all()
+
+    def status(self):
+        with self.cond:
+            return {
+                "limit": self.limit,
+                "remaining": self.remaining,
+                "reset_at": self.reset_at,
+                "blocked_for": max(0.0, self.blocked_until - time.time()),
+                "queued_interactive": self.waiting[INTERACTIVE],
+                "queued_background": self.waiting[BACKGROUND],
+                "in_flight": self.in_flight
+            }
+
+
+_scheduler = RequestScheduler()
+
+
+def get_scheduler():
+    return _scheduler
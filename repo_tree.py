@@ -0,0 +1,112 @@
+import threading
+from collections import OrderedDict
+
+import git_data
+
+MAX_TREES = 8
+
+
+class RepoTree:
+    # Whole-repo file listing from one `git/trees/<sha>?recursive=1` call.
+    # Trees are immutable, so they are cached by commit SHA; the only request
+    # on a warm cache is a conditional ref lookup (304 while the branch head
+    # hasn't moved, which doesn't count against the rate limit).
+
+    def __init__(self, max_trees=MAX_TREES):
+        self.lock = threading.Lock()
+        self.refs = {}
+        self.trees = OrderedDict()
+        self.truncated_trees = set()
+        self.max_trees = max_trees
+
+    def head(self, client, branch):
+        key = (client.owner, client.repo, branch)
+        with self.lock:
+            cached = self.refs.get(key)
+        headers = {"If-None-Match": cached["etag"]} if cached and cached.get("etag") else {}
+        r = client.get(f"git/ref/heads/{branch}", headers=headers)
+        if r.status_code == 304 and cached:
+            return cached["sha"]
+        if r.status_code != 200:
+            raise git_data.GitDataError("get ref", r)
+        sha = r.json()["object"]["sha"]
+        with self.lock:
+            self.refs[key] = {"sha": sha, "etag": r.headers.get("ETag")}
+        return sha
+
+    def files(self, client, branch):
+        # {path: {"path", "sha", "size"}} for every blob in the branch.
+        commit_sha = self.head(client, branch)
+        key = (client.owner, client.repo, commit_sha)
+        with self.lock:
+            if key in self.trees:
+                self.trees.move_to_end(key)
+                return self.trees[key]
+        r = client.get(f"git/trees/{commit_sha}", params={"recursive": "1"})
+        if r.status_code != 200:
+            raise git_data.GitDataError("get tree", r)
+        data = r.json()
+        files = {
+            item["path"]: {"path": item["path"], "sha": item["sha"], "size": item.get("size", 0)}
+            for item in data.get("tree", []) if item.get("type") == "blob"
+        }
+        # GitHub caps recursive trees (~100k entries); we still serve what we
+        # got rather than fall back to per-directory Contents API walks, but
+        # record it so callers that treat "missing" as "deleted" can refuse.
+        with self.lock:
+            self.trees[key] = files
+            if data.get("truncated"):
+                self.truncated_trees.add(key)
+            while len(self.trees) > self.max_trees:
+                old, _ = self.trees.popitem(last=False)
+                self.truncated_trees.discard(old)
+        return files
+
+    def truncated(self, client, branch):
+        # True if GitHub cut the branch's current tree listing short
+        self.files(client, branch)
+        commit_sha = self.head(client, branch)
+        with self.lock:
+            return (client.owner, client.repo, commit_sha) in self.truncated_trees
+
+    def under(self, client, branch, prefix, query=""):
+        # Files below `prefix` (any depth), optionally filtered by a
+        # case-insensitive substring of their path relative to `prefix`.
+        prefix = prefix.strip("/")
+        base = prefix + "/" if prefix else ""
+        query = query.lower().strip()
+        result = []
+        for path, item in self.files(client, branch).items():
+            if not path.startswith(base):
+                continue
+            rel = path[len(base):]
+            if query and query not in rel.lower():
+                continue
+            result.append(dict(item, name=rel.rsplit("/", 1)[-1], rel=rel))
+        result.sort(key=lambda x: x["rel"])
+        return result
+
+    def list_dir(self, client, branch, folder):
+        # Direct file children of `folder`, shaped like Contents API items.
+        return [
+            dict(item, html_url=f"https://github.com/{client.owner}/{client.repo}/blob/{branch}/{item['path']}")
+            for item in self.under(client, branch, folder) if "/" not in item["rel"]
+        ]
+
+
+def hierarchy(items):
+    # Nest `under()` results into {"dirs": {name: node}, "files": [item]}.
+    root = {"dirs": {}, "files": []}
+    for item in items:
+        node = root
+        for part in item["rel"].split("/")[:-1]:
+            node = node["dirs"].setdefault(part, {"dirs": {}, "files": []})
+        node["files"].append(item)
+    return root
+
+
+_tree = RepoTree()
+
+
+def get_tree():
+    return _tree
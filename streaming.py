@@ -0,0 +1,59 @@
+import os
+import json
+import base64
+
+# Multiple of 3 so every chunk base64-encodes without padding except the last
+CHUNK_SIZE = 3 * 64 * 1024
+_PLACEHOLDER = "\x00__CONTENT__\x00"
+
+
+def b64_length(size):
+    return 4 * ((size + 2) // 3)
+
+
+def iter_b64(path, chunk_size=CHUNK_SIZE, offset=0, length=None):
+    # Incremental base64 encoder: only one chunk of the file is in memory.
+    # `offset`/`length` select a byte range (one part of a split file).
+    with open(path, "rb") as f:
+        f.seek(offset)
+        remaining = length
+        while remaining is None or remaining > 0:
+            chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield base64.b64encode(chunk)
+
+
+# Request body that streams `payload` as JSON with the file at `path`
+# base64-encoded into `content_key`. `__len__` lets requests send a
+# Content-Length instead of falling back to chunked transfer encoding.
+class JSONFileBody:
+    def __init__(self, payload, path, content_key="content", chunk_size=CHUNK_SIZE, on_progress=None,
+                 offset=0, length=None):
+        doc = dict(payload)
+        doc[content_key] = _PLACEHOLDER
+        head, tail = json.dumps(doc).split(json.dumps(_PLACEHOLDER))
+        self.head = (head + '"').encode("utf-8")
+        self.tail = ('"' + tail).encode("utf-8")
+        self.path = path
+        self.chunk_size = chunk_size
+        self.offset = offset
+        self.size = os.path.getsize(path) - offset if length is None else length
+        self.on_progress = on_progress
+
+    def __len__(self):
+        return len(self.head) + b64_length(self.size) + len(self.tail)
+
+    def __iter__(self):
+        yield self.head
+        sent = 0
+        for chunk in iter_b64(self.path, self.chunk_size, self.offset, self.size):
+            yield chunk
+            # Report source bytes consumed, 0.0 .. 1.0
+            sent = min(self.size, sent + self.chunk_size)
+            if self.on_progress and self.size:
+                self.on_progress(sent / self.size)
+        yield self.tail
+
@@ -0,0 +1,267 @@
+import os
+import sys
+import json
+import tempfile
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import blob_store
+import git_data
+import large_files
+import repo_tree
+from locks import locked, atomic_write
+
+# Remote side of a user's sync: `<SYNC_ROOT>/<user>`, by default the
+# uploader's `TARGET_PATH/<user>` folder so existing uploads are reconciled
+SYNC_ROOT = os.getenv("SYNC_ROOT", os.getenv("TARGET_PATH", "uploads"))
+SYNC_WORKERS = int(os.getenv("SYNC_WORKERS", "8"))
+# Pushes are committed in batches so an interrupted sync keeps its progress
+SYNC_BATCH = int(os.getenv("SYNC_BATCH", "50"))
+STATE_DIR = ".sync"
+
+PUSH = "push"
+PULL = "pull"
+DELETE_REMOTE = "delete-remote"
+DELETE_LOCAL = "delete-local"
+CONFLICT = "conflict"
+
+
+class SyncError(Exception):
+    pass
+
+
+def remote_prefix(user):
+    return f"{SYNC_ROOT}/{user}"
+
+
+def _state_path(root, user):
+    return os.path.join(root, STATE_DIR, f"{user}.json")
+
+
+def load_state(root, user, prefix=None):
+    # {"prefix", "files": {name: {"sha256", "remote_sha"}}, "git_sha": {sha256: git sha}}.
+    # Synced records only mean something for the remote folder they were
+    # made against; syncing with a different one starts from scratch.
+    try:
+        with open(_state_path(root, user), "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        state = {}
+    state.setdefault("files", {})
+    state.setdefault("git_sha", {})
+    if prefix is not None and state.get("prefix") != prefix:
+        state["files"] = {}
+        state["prefix"] = prefix
+    return state
+
+
+def save_state(root, user, state):
+    atomic_write(_state_path(root, user), json.dumps(state, indent=1, sort_keys=True))
+
+
+def local_manifest(root, user, state):
+    # name -> {"size", "mtime", "sha256", "git_sha", "path"}; the git blob SHA
+    # is computed once per content hash and remembered in the state file.
+    files = {}
+    for entry in blob_store.list_files(root, user):
+        git_sha = state["git_sha"].get(entry["hash"])
+        if git_sha is None:
+            git_sha = state["git_sha"][entry["hash"]] = git_data.blob_sha(entry["path"])
+        files[entry["name"]] = {"size": entry["size"], "mtime": entry["mtime"], "sha256": entry["hash"],
+                                "git_sha": git_sha, "path": entry["path"]}
+    return files
+
+
+def remote_manifest(client, branch, prefix, local_name=None):
+    # name -> {"size", "sha", "path", "split", "paths"} from one cached tree
+    # listing; split files are represented by their manifest, parts are
+    # hidden. `local_name(rel)` maps a remote file name to the local one for
+    # folders whose uploads are renamed (e.g. timestamped); when several
+    # remote files map to one name the last in name order is current and
+    # "paths" lists them all. A truncated listing would make absent files
+    # look deleted, so refuse.
+    tree = repo_tree.get_tree()
+    items = tree.under(client, branch, prefix)
+    if tree.truncated(client, branch):
+        raise SyncError("GitHub truncated the repository tree listing; refusing to sync against a partial view")
+    files = {}
+    for item in sorted(items, key=lambda item: item["rel"]):
+        rel = item["rel"]
+        if ".parts/" in rel:
+            continue
+        split = large_files.is_manifest(rel)
+        name = large_files.original_path(rel) if split else rel
+        if local_name:
+            name = local_name(name)
+        paths = files[name]["paths"] if name in files else []
+        paths.append(item["path"])
+        files[name] = {"size": item["size"], "sha": item["sha"], "path": item["path"], "split": split,
+                       "paths": paths}
+    return files
+
+
+def _same(local, remote, client, branch):
+    # Content equality without downloading the file itself
+    if not remote["split"]:
+        return local["git_sha"] == remote["sha"]
+    try:
+        manifest = large_files.read_manifest(client, remote["path"], branch)
+    except git_data.GitDataError:
+        return False
+    return manifest.get("sha256") == local["sha256"]
+
+
+def plan(client, branch, root, user, state=None, prefix=None, local_name=None):
+    # Three-way diff of local, remote and the last synced state. Returns a
+    # list of (action, name).
+    prefix = prefix or remote_prefix(user)
+    state = state or load_state(root, user, prefix)
+    local = local_manifest(root, user, state)
+    remote = remote_manifest(client, branch, prefix, local_name)
+    synced = state["files"]
+    actions = []
+    for name in sorted(set(local) | set(remote) | set(synced)):
+        l, r, s = local.get(name), remote.get(name), synced.get(name)
+        local_changed = l is not None and (s is None or l["sha256"] != s["sha256"])
+        remote_changed = r is not None and (s is None or r["sha"] != s["remote_sha"])
+        if l and r:
+            if not local_changed and not remote_changed:
+                continue
+            if s is None and _same(l, r, client, branch):
+                # Identical on both sides, just never recorded
+                synced[name] = {"sha256": l["sha256"], "remote_sha": r["sha"]}
+                continue
+            if local_changed and remote_changed:
+                actions.append((CONFLICT, name))
+            elif local_changed:
+                actions.append((PUSH, name))
+            else:
+                actions.append((PULL, name))
+        elif l:
+            # Remote missing: deleted there since last sync, or new locally
+            actions.append((DELETE_LOCAL if s and not local_changed else PUSH, name))
+        elif r:
+            actions.append((DELETE_REMOTE if s and not remote_changed else PULL, name))
+        else:
+            synced.pop(name, None)
+    return actions, local, remote
+
+
+def sync(client, branch, root, user, dry_run=False, on_conflict="local", on_progress=None, prefix=None,
+         local_name=None, remote_path=None):
+    # Transfer only what differs, in parallel. Safe to re-run after an
+    # interruption: state is saved after every completed step, so finished
+    # transfers drop out of the next plan. `on_conflict` is "local",
+    # "remote" or "skip"; `prefix` is the remote folder (default
+    # `<SYNC_ROOT>/<user>`). `local_name`/`remote_path` translate between
+    # local names and remote paths for folders that rename uploads (default:
+    # the same name under `prefix`). A dry run writes nothing.
+    prefix = prefix or remote_prefix(user)
+    remote_path = remote_path or (lambda name: f"{prefix}/{name}")
+    with locked(_state_path(root, user)):
+        state = load_state(root, user, prefix)
+        actions, local, remote = plan(client, branch, root, user, state, prefix, local_name)
+        resolved = []
+        for action, name in actions:
+            if action == CONFLICT:
+                if on_conflict == "local":
+                    action = PUSH
+                elif on_conflict == "remote":
+                    action = PULL
+            resolved.append((action, name))
+        if dry_run:
+            return resolved
+
+        total = max(1, len([a for a in resolved if a[0] != CONFLICT]))
+        done = []
+
+        def step():
+            done.append(1)
+            if on_progress:
+                on_progress(len(done) / total)
+
+        pushes = [name for action, name in resolved if action == PUSH]
+        for start in range(0, len(pushes), SYNC_BATCH):
+            batch = pushes[start:start + SYNC_BATCH]
+            files = [(remote_path(name), local[name]["path"]) for name in batch]
+            _, visible = large_files.upload_files(client, files, f"Sync {len(batch)} files for {user}", branch)
+            for name, item in zip(batch, visible):
+                state["files"][name] = {"sha256": local[name]["sha256"], "remote_sha": item["sha"]}
+                step()
+            save_state(root, user, state)
+
+        def pull(name):
+            fd, tmp = tempfile.mkstemp(dir=root, prefix=".sync-")
+            os.close(fd)
+            try:
+                large_files.download(client, remote[name]["path"], branch, tmp)
+                version, _ = blob_store.put(root, user, name, tmp)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            return name, version["hash"]
+
+        pulls = [name for action, name in resolved if action == PULL]
+        if pulls:
+            with ThreadPoolExecutor(max_workers=min(SYNC_WORKERS, len(pulls))) as pool:
+                for name, digest in pool.map(pull, pulls):
+                    state["files"][name] = {"sha256": digest, "remote_sha": remote[name]["sha"]}
+                    step()
+                    save_state(root, user, state)
+
+        remote_deletes = [name for action, name in resolved if action == DELETE_REMOTE]
+        if remote_deletes:
+            paths = large_files.expand_paths(client, [path for name in remote_deletes for path in remote[name]["paths"]],
+                                             branch)
+            git_data.delete_paths(client, paths, f"Sync: delete {len(remote_deletes)} files for {user}", branch)
+            for name in remote_deletes:
+                state["files"].pop(name, None)
+                step()
+            save_state(root, user, state)
+
+        for action, name in resolved:
+            if action == DELETE_LOCAL:
+                blob_store.delete(root, user, name)
+                state["files"].pop(name, None)
+                step()
+        save_state(root, user, state)
+        return resolved
+
+
+def describe(actions):
+    counts = {}
+    for action, _ in actions:
+        counts[action] = counts.get(action, 0) + 1
+    return ", ".join(f"{count} {action}" for action, count in sorted(counts.items())) or "in sync"
+
+
+def main(argv=None):
+    # e.g. restore a user's GitHub copy onto a fresh server:
+    #   python sync.py local_backup alice --dry-run
+    from dotenv import load_dotenv
+    from github_client import get_client
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Two-way sync of a user's local backups with GitHub")
+    parser.add_argument("root", help="blob store root, e.g. local_backup or local_backups")
+    parser.add_argument("user")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--on-conflict", choices=["local", "remote", "skip"], default="local")
+    parser.add_argument("--prefix", help=f"remote folder (default {SYNC_ROOT}/<user>)")
+    args = parser.parse_args(argv)
+
+    client = get_client()
+    try:
+        actions = sync(client, client.branch, args.root, args.user, dry_run=args.dry_run,
+                       on_conflict=args.on_conflict, prefix=args.prefix)
+    except SyncError as e:
+        print(e, file=sys.stderr)
+        return 1
+    for action, name in actions:
+        print(f"{action:14} {name}")
+    print(describe(actions))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
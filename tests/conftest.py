@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The links app imports its modules flat, with the repo root on the path
+sys.path[:0] = [os.path.join(ROOT, "user_links"), ROOT]
+
+PAGE = b"""<html><head><title>  Local
+  Page </title><link rel="shortcut icon" href="/static/icon.png"></head><body>hi</body></html>"""
+PLAIN = b"<html><head><title>Plain</title></head></html>"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Routes:
+    #   /page, /plain     HTML with/without an icon link
+    #   /no-head          405 for HEAD, 200 for GET
+    #   /redirect         301 to /page
+    #   /flaky            500 on the first request, 200 after
+    #   /slow...          200 after a short sleep; tracks concurrency
+    def log_message(self, *args):
+        pass
+
+    def _route(self, body=True):
+        server = self.server
+        path = self.path.split("?", 1)[0]
+        with server.lock:
+            server.hits[path] = server.hits.get(path, 0) + 1
+            hits = server.hits[path]
+        if path == "/no-head" and self.command == "HEAD":
+            return self._send(405)
+        if path == "/redirect":
+            return self._send(301, headers={"Location": "/page"})
+        if path == "/flaky" and hits == 1:
+            return self._send(500)
+        if path.startswith("/slow"):
+            with server.lock:
+                server.active += 1
+                server.max_active = max(server.max_active, server.active)
+            time.sleep(0.2)
+            with server.lock:
+                server.active -= 1
+        self._send(200, PAGE if path in ("/page", "/flaky") else PLAIN, body=body)
+
+    def _send(self, code, content=b"", headers=None, body=True):
+        self.send_response(code)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(content)
+
+    def do_GET(self):
+        self._route()
+
+    def do_HEAD(self):
+        self._route(body=False)
+
+
+@pytest.fixture
+def server():
+    # Local HTTP stand-in; `server.url(path)` builds URLs for it
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.daemon_threads = True
+    httpd.lock = threading.Lock()
+    httpd.hits = {}
+    httpd.active = httpd.max_active = 0
+    httpd.url = lambda path: f"http://127.0.0.1:{httpd.server_port}{path}"
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
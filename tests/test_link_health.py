@@ -0,0 +1,53 @@
+import link_health
+from conftest import wait_for
+
+
+def checker(**kwargs):
+    kwargs.setdefault("host_interval", 0)
+    return link_health.HealthChecker(allow_private=True, **kwargs)
+
+
+def test_head_falls_back_to_get_on_405(server):
+    result = link_health.check(server.url("/no-head"), allow_private=True)
+    assert result["status"] == 200
+    assert result["error"] is None
+    assert server.hits["/no-head"] == 2
+
+
+def test_redirect_is_reported(server):
+    result = link_health.check(server.url("/redirect"), allow_private=True)
+    assert result["status"] == 200
+    assert result["redirect"] == server.url("/page")
+    assert link_health.badge(result).startswith("🟡 200")
+
+
+def test_private_addresses_blocked_by_default(server):
+    result = link_health.check(server.url("/page"), allow_private=False)
+    assert result["status"] is None
+    assert "blocked" in result["error"]
+    assert "/page" not in server.hits
+
+
+def test_results_cached_for_ttl(server):
+    health = checker(ttl=3600)
+    url = server.url("/page")
+    assert health.schedule([url]) == 1
+    assert wait_for(lambda: health.get(url) is not None)
+    assert health.schedule([url]) == 0
+    assert health.schedule([url], force=True) == 1
+    assert wait_for(lambda: not health.is_pending(url))
+    assert server.hits["/page"] == 2
+
+    expired = checker(ttl=0)
+    expired.schedule([url])
+    assert wait_for(lambda: expired.get(url) is not None)
+    assert expired.schedule([url]) == 1
+
+
+def test_per_host_cap(server):
+    health = checker(max_workers=8, per_host=2)
+    urls = [server.url(f"/slow?{i}") for i in range(6)]
+    assert health.schedule(urls) == 6
+    assert wait_for(lambda: health.pending_count() == 0)
+    assert all(health.get(url)["status"] == 200 for url in urls)
+    assert server.max_active == 2
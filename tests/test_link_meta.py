@@ -0,0 +1,68 @@
+import time
+
+import link_meta
+from conftest import wait_for
+
+
+def cache(tmp_path, **kwargs):
+    return link_meta.MetadataCache(path=str(tmp_path / "meta.json"), allow_private=True, **kwargs)
+
+
+def test_title_and_favicon(server):
+    meta = link_meta.fetch(server.url("/page"), allow_private=True)
+    assert meta["title"] == "Local Page"
+    assert meta["favicon"] == server.url("/static/icon.png")
+    assert "error" not in meta
+
+
+def test_default_favicon(server):
+    meta = link_meta.fetch(server.url("/plain"), allow_private=True)
+    assert meta["title"] == "Plain"
+    assert meta["favicon"] == server.url("/favicon.ico")
+
+
+def test_private_addresses_blocked_by_default(server):
+    meta = link_meta.fetch(server.url("/page"), allow_private=False)
+    assert "blocked" in meta["error"]
+    assert not server.hits
+
+
+def test_errors_retried_after_ttl(server, tmp_path):
+    metadata = cache(tmp_path, error_ttl=0.2)
+    url = server.url("/flaky")
+    assert metadata.schedule([url]) == 1
+    assert wait_for(lambda: metadata.get(url) is not None)
+    assert metadata.get(url)["error"]
+    assert metadata.schedule([url]) == 0
+    time.sleep(0.25)
+    assert metadata.schedule([url]) == 1
+    assert wait_for(lambda: metadata.get(url).get("title") == "Local Page")
+    # Successes are kept
+    time.sleep(0.25)
+    assert metadata.schedule([url]) == 0
+
+
+def test_lru_eviction(server, tmp_path):
+    metadata = cache(tmp_path, max_entries=2)
+    first, second, third = (server.url(f"/plain?{i}") for i in range(3))
+    for url in (first, second):
+        metadata.schedule([url])
+        assert wait_for(lambda: metadata.get(url) is not None)
+    metadata.get(first)  # now most recently used
+    metadata.schedule([third])
+    assert wait_for(lambda: metadata.get(third) is not None)
+    assert metadata.get(first) is not None
+    assert metadata.get(second) is None
+
+
+def test_persistence_round_trip(server, tmp_path):
+    metadata = cache(tmp_path)
+    url = server.url("/page")
+    metadata.schedule([url])
+    assert wait_for(lambda: metadata.get(url) is not None)
+    metadata.save()
+
+    reloaded = cache(tmp_path)
+    assert reloaded.get(url)["title"] == "Local Page"
+    assert reloaded.schedule([url]) == 0
+    assert server.hits["/page"] == 1
@@ -0,0 +1,268 @@
+import os
+import re
+import json
+import time
+import threading
+
+import blob_store
+from locks import atomic_write
+
+# Token sets are cached on disk per content hash: a blob is tokenized once,
+# however many users or restarts see it.
+CACHE_DIR = os.getenv("TEXT_INDEX_DIR", os.path.join("local_backups", ".index", "text"))
+MAX_TEXT_SIZE = int(os.getenv("TEXT_INDEX_MAX_SIZE", str(32 * 1024 * 1024)))
+SNIPPET_RESULTS = 20
+TOKEN_VERSION = 1
+# Searches re-check manifest / folder mtimes at most this often (seconds)
+CHECK_INTERVAL = float(os.getenv("TEXT_INDEX_CHECK_INTERVAL", "2"))
+STORE = "store"
+LEGACY = "legacy"
+
+_TOKEN = re.compile(r"[A-Za-z0-9_]{2,}")
+
+
+def tokens_of(text):
+    return {t.lower() for t in _TOKEN.findall(text)}
+
+
+def _is_text(path):
+    with open(path, "rb") as f:
+        return b"\0" not in f.read(8192)
+
+
+def _tokenize_file(path):
+    # Line by line, so memory is bounded by the token set, not the file
+    found = set()
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            found.update(tokens_of(line))
+    return found
+
+
+class TextIndex:
+    # Inverted index token -> content hashes over the latest version of every
+    # text file in the roots: blob store manifests plus legacy flat
+    # `<root>/<user>/` folders. Built once in the background, kept current
+    # from in-process blob_store events, and re-checked against manifest and
+    # folder mtimes on search so writes from other processes show up too.
+    # Queries AND their tokens over in-memory posting sets.
+
+    def __init__(self, roots, cache_dir=CACHE_DIR, check_interval=CHECK_INTERVAL):
+        self.roots = list(roots)
+        self.cache_dir = cache_dir
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.docs = {}      # (root, user, name, source) -> (hash, path)
+        self.owners = {}    # hash -> {doc key}
+        self.postings = {}  # token -> {hash}
+        self.indexed = {}   # hash -> frozenset(tokens)
+        self.stamps = {}    # (source, root, user) -> manifest / folder stamp
+        self.file_hashes = {}  # legacy path -> ((mtime, size), sha256)
+        self.last_check = 0.0
+        self.ready = threading.Event()
+        blob_store.subscribe(self._on_change)
+
+    def _tokens_for(self, digest, path):
+        cache_file = os.path.join(self.cache_dir, f"{digest}.json")
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("version") == TOKEN_VERSION:
+                return set(cached["tokens"])
+        except (FileNotFoundError, ValueError):
+            pass
+        if os.path.getsize(path) > MAX_TEXT_SIZE or not _is_text(path):
+            found = set()
+        else:
+            found = _tokenize_file(path)
+        atomic_write(cache_file, json.dumps({"version": TOKEN_VERSION, "tokens": sorted(found)}))
+        return found
+
+    def _add(self, key, digest, path):
+        # Tokenize outside the lock (file I/O), then swap the doc in.
+        with self.lock:
+            if self.docs.get(key) == (digest, path):
+                return
+            found = self.indexed.get(digest)
+        if found is None:
+            found = frozenset(self._tokens_for(digest, path))
+        with self.lock:
+            self._detach(key)
+            self.docs[key] = (digest, path)
+            self.owners.setdefault(digest, set()).add(key)
+            if digest not in self.indexed:
+                self.indexed[digest] = found
+                for token in found:
+                    self.postings.setdefault(token, set()).add(digest)
+
+    def _detach(self, key):
+        # Caller holds the lock
+        old = self.docs.pop(key, None)
+        if not old:
+            return
+        digest = old[0]
+        owners = self.owners.get(digest, set())
+        owners.discard(key)
+        if owners:
+            return
+        self.owners.pop(digest, None)
+        for token in self.indexed.pop(digest, ()):
+            hashes = self.postings.get(token)
+            if hashes:
+                hashes.discard(digest)
+                if not hashes:
+                    del self.postings[token]
+
+    def _on_change(self, event, root, user, name, version):
+        if root not in self.roots:
+            return
+        key = (root, user, name, STORE)
+        if event == "delete" or version is None:
+            with self.lock:
+                self._detach(key)
+        else:
+            self._add(key, version["hash"], blob_store.blob_path(root, version["hash"]))
+
+    def _legacy_hash(self, entry):
+        # Loose files aren't content-addressed; hash only when they change.
+        st = entry.stat()
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self.file_hashes.get(entry.path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        digest = blob_store.file_sha256(entry.path)
+        self.file_hashes[entry.path] = (stamp, digest)
+        return digest
+
+    def _wanted(self, source, root, user):
+        # {doc key: (hash, path)} currently on disk for one user and source
+        wanted = {}
+        if source == STORE:
+            for entry in blob_store.list_files(root, user):
+                wanted[(root, user, entry["name"], STORE)] = (entry["hash"], entry["path"])
+            return wanted
+        directory = os.path.join(root, user)
+        if os.path.isdir(directory):
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.is_file() and not entry.name.endswith(".lock"):
+                        try:
+                            wanted[(root, user, entry.name, LEGACY)] = (self._legacy_hash(entry), entry.path)
+                        except OSError:
+                            continue
+        return wanted
+
+    def _reconcile(self, source, root, user):
+        wanted = self._wanted(source, root, user)
+        with self.lock:
+            stale = [k for k in self.docs if k[0] == root and k[1] == user and k[3] == source and k not in wanted]
+            for key in stale:
+                self._detach(key)
+        for key, (digest, path) in wanted.items():
+            try:
+                self._add(key, digest, path)
+            except OSError:
+                continue
+
+    def _current_stamps(self):
+        # One stat per manifest and per legacy folder
+        stamps = {}
+        for root in self.roots:
+            if not os.path.isdir(root):
+                continue
+            manifests = os.path.join(root, blob_store.MANIFESTS)
+            if os.path.isdir(manifests):
+                with os.scandir(manifests) as it:
+                    for entry in it:
+                        if entry.name.endswith(".json"):
+                            st = entry.stat()
+                            stamps[(STORE, root, entry.name[:-len(".json")])] = (st.st_mtime_ns, st.st_size, st.st_ino)
+            with os.scandir(root) as it:
+                for entry in it:
+                    if entry.is_dir() and blob_store.valid_user(entry.name):
+                        st = entry.stat()
+                        stamps[(LEGACY, root, entry.name)] = (st.st_mtime_ns, st.st_ino)
+        return stamps
+
+    def refresh(self, force=False):
+        # Re-read only the users whose manifest or legacy folder changed
+        # since the last check (e.g. written by the other app or another
+        # worker). Skipped if another thread is already refreshing.
+        now = time.time()
+        if not force and now - self.last_check < self.check_interval:
+            return
+        if not self.refresh_lock.acquire(blocking=force):
+            return
+        try:
+            self.last_check = now
+            current = self._current_stamps()
+            for key in set(current) | set(self.stamps):
+                if current.get(key) != self.stamps.get(key):
+                    self._reconcile(*key)
+            self.stamps = current
+        finally:
+            self.refresh_lock.release()
+
+    def build(self):
+        # One pass over the sources at startup; cached token sets make it
+        # cheap after the first run.
+        try:
+            self.refresh(force=True)
+        finally:
+            self.ready.set()
+
+    def start(self):
+        threading.Thread(target=self.build, name="text-index", daemon=True).start()
+        return self
+
+    def search(self, query, user=None, limit=50):
+        # Files containing every token of `query` (optionally one user's),
+        # with the first matching line for the top results.
+        wanted = tokens_of(query)
+        if not wanted:
+            return []
+        if self.ready.is_set():
+            self.refresh()
+        with self.lock:
+            sets = [self.postings.get(token, set()) for token in wanted]
+            sets.sort(key=len)
+            hashes = set(sets[0])
+            for other in sets[1:]:
+                hashes &= other
+                if not hashes:
+                    break
+            hits = []
+            for digest in hashes:
+                for key in self.owners.get(digest, ()):
+                    root, owner, name, _ = key
+                    if user is None or owner == user:
+                        hits.append({"root": root, "user": owner, "file": name, "path": self.docs[key][1]})
+        hits.sort(key=lambda h: (h["user"], h["file"]))
+        hits = hits[:limit]
+        for hit in hits[:SNIPPET_RESULTS]:
+            hit.update(self._snippet(hit["path"], wanted))
+        return hits
+
+    def _snippet(self, path, wanted):
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                for number, line in enumerate(f, 1):
+                    if wanted & tokens_of(line):
+                        return {"line": number, "snippet": line.strip()[:200]}
+        except OSError:
+            pass
+        return {"line": None, "snippet": ""}
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(roots):
+    # One index per set of roots per process, built in the background.
+    key = tuple(roots)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = TextIndex(roots).start()
+        return _indexes[key]
@@ -1,10 +1,23 @@
 import streamlit as st
 import os
+import time
 import base64
-import requests
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, wait
 from dotenv import load_dotenv
 from datetime import datetime
 
+import blob_store
+import git_data
+import large_files
+import repo_tree
+import rate_limit
+import java_index
+import text_index
+import sync
+from github_client import get_client
+from listing_cache import get_cache
+
 # Load environment variables
 load_dotenv()
 
@@ -14,11 +27,87 @@ REPO_NAME = os.getenv("REPO_NAME")
 TARGET_PATH = os.getenv("TARGET_PATH", "uploads")
 BRANCH = os.getenv("BRANCH", "main")
 LOCAL_BACKUP_DIR = "local_backups"
+# Fold pre-blob-store per-user folders into the store, once per backup dir
+blob_store.migrate_legacy(LOCAL_BACKUP_DIR)
+
+github = get_client(GITHUB_TOKEN, REPO_OWNER, REPO_NAME, BRANCH)
+listings = get_cache()
+# Seconds a save may take before we report back; work continues afterwards
+SAVE_BUDGET = float(os.getenv("SAVE_BUDGET", "30"))
+
+
+@st.cache_resource
+def get_save_pool():
+    # Streamlit re-executes this script on every rerun; keep one pool.
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="save")
+
+
+def backup_locally(user, file_name, file_content):
+    # Versioned, deduplicated, written via temp file + rename (LOCAL_FSYNC=1
+    # to also fsync): identical bytes are stored once.
+    version, created = blob_store.put(LOCAL_BACKUP_DIR, user, file_name, file_content)
+    return blob_store.blob_path(LOCAL_BACKUP_DIR, version["hash"]), created
+
+
+def unchanged_split(target_path, file_content):
+    # A file uploaded split only exists remotely as its manifest; compare
+    # the manifest's sha256 with ours, as sync does.
+    manifest_path = target_path + large_files.MANIFEST_SUFFIX
+    if listings.file_sha(github, manifest_path, BRANCH) is None:
+        return False
+    try:
+        manifest = large_files.read_manifest(github, manifest_path, BRANCH)
+    except git_data.GitDataError:
+        return False
+    return manifest.get("sha256") == hashlib.sha256(file_content).hexdigest()
+
+
+def push_to_github(user, file_name, file_content, target_path, backup_future):
+    # Compare the local git blob SHA with the remote one (from the cached
+    # folder listing) and skip the PUT and the commit when identical.
+    sha = listings.file_sha(github, target_path, BRANCH)
+    unchanged = sha == git_data.blob_sha(file_content) if sha is not None else unchanged_split(target_path, file_content)
+    result = {"status_code": 200, "path": target_path, "error": None, "unchanged": unchanged}
+    if result["unchanged"]:
+        return result
+
+    commit_message = f"Upload {file_name} by {user} on {datetime.utcnow().isoformat()} UTC"
+    if large_files.is_large(len(file_content)):
+        # Big files skip the inline Contents API: stream git blobs from the
+        # local backup copy (split into parts past SPLIT_THRESHOLD), so this
+        # branch waits for the backup.
+        local_file_path, _ = backup_future.result()
+        try:
+            _, visible = large_files.upload_files(github, [(target_path, local_file_path)], commit_message, BRANCH)
+            result.update(status_code=201, path=visible[0]["path"])
+        except git_data.GitDataError as ex:
+            result.update(status_code=ex.status_code, error=ex.detail)
+        listings.invalidate(github, target_path, BRANCH)
+        return result
+
+    data = {
+        "message": commit_message,
+        "content": base64.b64encode(file_content).decode("utf-8"),
+        "branch": BRANCH
+    }
+    if sha:
+        data["sha"] = sha
+
+    response = github.put(github.contents_url(target_path), json=data)
+    listings.invalidate(github, target_path, BRANCH)
+    if response.status_code in (409, 422):
+        # Cached SHA was stale; fetch the current one and retry once
+        res = github.get(github.contents_url(target_path), params={"ref": BRANCH})
+        if res.status_code == 200:
+            data["sha"] = res.json().get("sha")
+            response = github.put(github.contents_url(target_path), json=data)
+    result["status_code"] = response.status_code
+    if response.status_code in (200, 201):
+        result["path"] = response.json().get("content", {}).get("path", "")
+    else:
+        result["error"] = response.json()
+    return result
 
-headers = {
-    "Authorization": f"token {GITHUB_TOKEN}",
-    "Accept": "application/vnd.github+json"
-}
 
 st.set_page_config(page_title="Save to GitHub", page_icon="💾")
 st.title("📁 Save Files to GitHub with Backup")
@@ -36,7 +125,9 @@ else:
     username = st.sidebar.text_input("Username")
     password = st.sidebar.text_input("Password", type="password")
     if st.sidebar.button("Login"):
-        if username and password:
+        if username and password and not blob_store.valid_user(username):
+            st.error("Username can't start with '.' or contain '/' or '\\'")
+        elif username and password:
             st.session_state.user = username
             st.success("Logged in!")
             st.rerun()
@@ -56,66 +147,139 @@ if st.session_state.user:
 
         # Save button to control push
     if st.button("💾 Save to GitHub"):
-            # Local backup
-            local_user_dir = os.path.join(LOCAL_BACKUP_DIR, st.session_state.user)
-            os.makedirs(local_user_dir, exist_ok=True)
-            local_file_path = os.path.join(local_user_dir, file_name)
-            with open(local_file_path, "wb") as f:
-                f.write(file_content)
-
-            st.info(f"✅ File also saved locally at: {local_file_path}")
-
-            # Check if file already exists to get SHA
-            sha = None
-            check_url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents/{target_path}?ref={BRANCH}"
-            res = requests.get(check_url, headers=headers)
-            if res.status_code == 200:
-                sha = res.json().get("sha")
-
-            encoded_content = base64.b64encode(file_content).decode("utf-8")
-
-            data = {
-                "message": f"Upload {file_name} by {st.session_state.user} on {datetime.utcnow().isoformat()} UTC",
-                "content": encoded_content,
-                "branch": BRANCH
-            }
-            if sha:
-                data["sha"] = sha
-
-            upload_url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents/{target_path}"
-            response = requests.put(upload_url, headers=headers, json=data)
-
-            if response.status_code in (200, 201):
-                st.success("✅ File saved to GitHub!")
-                st.code(response.json().get("content", {}).get("path", ""))
-
-                # Display Java file content
-                if file_name.endswith(".java"):
-                    st.subheader("📄 Java File Preview")
-                    st.code(file_content.decode("utf-8"), language="java")
-
-                # Show open file button
-                raw_url = f"https://raw.githubusercontent.com/{REPO_OWNER}/{REPO_NAME}/{BRANCH}/{target_path}"
-                st.markdown(f"[📂 Open File]({raw_url})", unsafe_allow_html=True)
-                st.download_button("⬇️ Download File", file_content, file_name)
+            # Local backup and remote check+upload run concurrently under one
+            # latency budget; results are reported together once both finish.
+            user = st.session_state.user
+            started = time.monotonic()
+            save_pool = get_save_pool()
+            backup_future = save_pool.submit(backup_locally, user, file_name, file_content)
+            push_future = save_pool.submit(push_to_github, user, file_name, file_content, target_path, backup_future)
+            done, pending = wait([backup_future, push_future], timeout=SAVE_BUDGET)
+            elapsed = time.monotonic() - started
+
+            if backup_future in done and backup_future.exception() is None:
+                local_file_path, created = backup_future.result()
+                if created:
+                    st.info(f"✅ File also saved locally at: {local_file_path}")
+                else:
+                    st.info(f"✅ Local backup unchanged: {local_file_path}")
+            elif backup_future in done:
+                st.error(f"❌ Local backup failed: {backup_future.exception()}")
             else:
-                st.error(f"❌ GitHub error: {response.status_code}")
-                st.json(response.json())
+                st.warning("⏳ Local backup is still being written.")
 
-    # List existing files for this user
+            if push_future not in done:
+                st.warning(f"⏳ GitHub upload still running after {SAVE_BUDGET:.0f}s; it will finish in the background.")
+            elif push_future.exception() is not None:
+                st.error(f"❌ GitHub error: {push_future.exception()}")
+            else:
+                result = push_future.result()
+                if result["status_code"] in (200, 201):
+                    if result["unchanged"]:
+                        st.success("✅ Unchanged — GitHub already has this exact file, nothing committed.")
+                    else:
+                        st.success("✅ File saved to GitHub!")
+                    st.code(result["path"])
+
+                    # Display Java file content
+                    if file_name.endswith(".java"):
+                        st.subheader("📄 Java File Preview")
+                        st.code(file_content.decode("utf-8"), language="java")
+
+                    # Show open file button
+                    raw_url = f"https://raw.githubusercontent.com/{REPO_OWNER}/{REPO_NAME}/{BRANCH}/{target_path}"
+                    st.markdown(f"[📂 Open File]({raw_url})", unsafe_allow_html=True)
+                    st.download_button("⬇️ Download File", file_content, file_name)
+                else:
+                    st.error(f"❌ GitHub error: {result['status_code']}")
+                    st.json(result["error"])
+            st.caption(f"Saved in {elapsed:.2f}s")
+            if file_name.endswith(".java"):
+                java_index.get_index().schedule()
+
+    # List existing files for this user: one recursive tree fetch per branch
+    # head, so nested folders cost nothing extra.
     st.subheader("📜 Your Saved Files")
     user_dir_path = f"{TARGET_PATH}/{st.session_state.user}"
-    list_url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents/{user_dir_path}?ref={BRANCH}"
-    list_response = requests.get(list_url, headers=headers)
-
-    if list_response.status_code == 200:
-        for file_info in list_response.json():
-            file_name = file_info.get("name")
-            file_path = file_info.get("path")
-            raw_file_url = f"https://raw.githubusercontent.com/{REPO_OWNER}/{REPO_NAME}/{BRANCH}/{file_path}"
-            st.markdown(f"📄 [{file_name}]({raw_file_url})", unsafe_allow_html=True)
-            st.markdown(f"<a href='{raw_file_url}' download='{file_name}'><button>⬇️ Download</button></a>", unsafe_allow_html=True)
-    elif list_response.status_code == 404:
-        st.info("No files saved yet.")
-    else:
+    file_filter = st.text_input("Filter files", key="saved_files_filter")
+
+    def render_node(node, depth=0):
+        lines = []
+        indent = "  " * depth
+        for name in sorted(node["dirs"]):
+            lines.append(f"{indent}- 📁 **{name}/**")
+            lines.extend(render_node(node["dirs"][name], depth + 1))
+        for file_info in node["files"]:
+            file_name = file_info["name"]
+            raw_file_url = f"https://raw.githubusercontent.com/{REPO_OWNER}/{REPO_NAME}/{BRANCH}/{file_info['path']}"
+            lines.append(
+                f"{indent}- 📄 [{file_name}]({raw_file_url}) "
+                f"<a href='{raw_file_url}' download='{file_name}'><button>⬇️ Download</button></a>"
+            )
+        return lines
+
+    try:
+        saved_items = repo_tree.get_tree().under(github, BRANCH, user_dir_path, file_filter)
+    except (git_data.GitDataError, rate_limit.RateLimitExceeded):
         st.warning("Could not load saved files list.")
+    else:
+        if saved_items:
+            st.caption(f"{len(saved_items)} files")
+            st.markdown("\n".join(render_node(repo_tree.hierarchy(saved_items))), unsafe_allow_html=True)
+        elif file_filter:
+            st.info("No files match the filter.")
+        else:
+            st.info("No files saved yet.")
+
+    # Full-text search over this user's backups
+    st.subheader("🔍 Search Your Backups")
+    text_query = st.text_input("Words to find", key="backup_text_query")
+    if text_query:
+        text_hits = text_index.get_index([LOCAL_BACKUP_DIR]).search(text_query, user=st.session_state.user)
+        for hit in text_hits:
+            location = f" (line {hit['line']})" if hit.get("line") else ""
+            st.markdown(f"📄 **{hit['file']}**{location}")
+            if hit.get("snippet"):
+                st.code(hit["snippet"])
+        if not text_hits:
+            st.info("No matches.")
+
+    # Symbol search across every user's Java backups (served from the
+    # background index; nothing is parsed during the rerun)
+    st.subheader("🔎 Find Java Symbols")
+    search_col, kind_col = st.columns([3, 1])
+    with search_col:
+        symbol_query = st.text_input("Class, method or field name (e.g. Foo or Foo.bar)", key="java_symbol_query")
+    with kind_col:
+        symbol_kind = st.selectbox("Kind", ["any", "class", "interface", "enum", "record", "method", "field", "package"])
+    if symbol_query:
+        hits = java_index.get_index().search(symbol_query, kind=None if symbol_kind == "any" else symbol_kind)
+        if hits:
+            st.dataframe(
+                [{"user": h["user"], "file": h["file"], "kind": h["kind"],
+                  "symbol": f"{h['container']}.{h['name']}" if h["container"] else h["name"],
+                  "line": h["line"]} for h in hits],
+                use_container_width=True
+            )
+        else:
+            st.info("No matching symbols (new uploads are indexed in the background).")
+
+    # Two-way sync of this user's backups with the repo's sync folder
+    st.sidebar.subheader("🔁 Sync with GitHub")
+    sync_dry_run = st.sidebar.checkbox("Preview only (dry run)", value=True)
+    if st.sidebar.button("Run sync"):
+        try:
+            sync_actions = sync.sync(github, BRANCH, LOCAL_BACKUP_DIR, st.session_state.user,
+                                     dry_run=sync_dry_run, prefix=f"{TARGET_PATH}/{st.session_state.user}")
+            st.sidebar.success(sync.describe(sync_actions))
+            for action, name in sync_actions:
+                st.sidebar.caption(f"{action}: {name}")
+        except (git_data.GitDataError, rate_limit.RateLimitExceeded, sync.SyncError) as ex:
+            st.sidebar.error(f"Sync failed: {ex}")
+
+    api_status = rate_limit.get_scheduler().status()
+    if api_status["remaining"] is not None:
+        st.sidebar.caption(
+            f"GitHub API budget: {api_status['remaining']}/{api_status['limit']} · "
+            f"waiting: {api_status['queued_interactive'] + api_status['queued_background']}"
+        )
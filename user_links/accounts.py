@@ -0,0 +1,219 @@
+import io
+import os
+import csv
+import json
+
+import link_log
+import user_store
+from locks import locked, atomic_write
+
+FIELDNAMES = ['name', 'email', 'username', 'password']
+# Profile updates are appended to `<users.csv>.updates` and folded back into
+# the CSV once there are this many
+COMPACT_UPDATES = int(os.getenv("USERS_COMPACT_UPDATES", "200"))
+
+
+class AccountError(Exception):
+    pass
+
+
+def normalize(username):
+    return str(username).strip().lower()
+
+
+def _updates_path(path):
+    return path + ".updates"
+
+
+def _read_updates(path):
+    # Update records that apply to the current users.csv. The first line
+    # names the CSV inode they were written against: once a compaction has
+    # replaced the CSV (new inode) a leftover log is already folded in and
+    # is ignored, so a crash mid-compaction can't apply an update twice.
+    try:
+        with open(_updates_path(path), 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return []
+    try:
+        header = json.loads(lines[0])
+    except (IndexError, ValueError):
+        return []
+    if header.get('base') != os.stat(path).st_ino:
+        return []
+    records = []
+    for line in lines[1:]:
+        if not line.endswith('\n'):
+            # Torn append from a crash: the update never committed
+            break
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue
+    return records
+
+
+def _apply(users, record):
+    if 'new' not in record:
+        # {"done": true}: marks the previous update's link move finished
+        return
+    users.pop(record['old'], None)
+    users[record['new']] = record['row']
+
+
+def _read(path):
+    # Pure read: never touches link files (see _recover)
+    users = {}
+    with open(path, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            key = normalize(row.get('username') or '')
+            if key and key not in users:
+                users[key] = row
+    for record in _read_updates(path):
+        _apply(users, record)
+    return users
+
+
+def ensure_file(path):
+    if not os.path.exists(path):
+        with locked(path):
+            if not os.path.exists(path):
+                with open(path, 'w', newline='') as f:
+                    csv.DictWriter(f, fieldnames=FIELDNAMES).writeheader()
+
+
+def _index(path):
+    # Shared by every Streamlit session; re-parsed only when users.csv or
+    # its update log changed on disk (another worker wrote it)
+    ensure_file(path)
+    return user_store.cached(path, _read, also=(_updates_path(path),))
+
+
+def _remember(path, users):
+    user_store.remember(path, _read, users, also=(_updates_path(path),))
+
+
+def find(path, username):
+    return _index(path).get(normalize(username))
+
+
+def exists(path, username):
+    return normalize(username) in _index(path)
+
+
+def check_login(path, username, password):
+    row = find(path, username)
+    return row is not None and str(row.get('password', '')).strip() == password
+
+
+def register(path, name, email, username, password):
+    # False if the username is taken. Check and append share one lock, and
+    # the cache is updated in place rather than re-read. Appending keeps the
+    # CSV's inode, so pending update records stay valid.
+    ensure_file(path)
+    with locked(path):
+        users = _recover(path)
+        key = normalize(username)
+        if key in users:
+            return False
+        row = {'name': name.strip(), 'email': email.strip(), 'username': username, 'password': password}
+        with open(path, 'a', newline='') as f:
+            csv.DictWriter(f, fieldnames=FIELDNAMES).writerow(row)
+        users[key] = row
+        _remember(path, users)
+    return True
+
+
+def _compact(path, users):
+    # Caller holds the lock. Fold the update log into a fresh CSV, then drop
+    # the log; the new CSV's inode retires the log even if the removal is
+    # lost to a crash.
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=FIELDNAMES, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(users.values())
+    atomic_write(path, out.getvalue(), fsync=True)
+    try:
+        os.remove(_updates_path(path))
+    except FileNotFoundError:
+        pass
+
+
+def _append_update(path, record):
+    # Caller holds the lock. One fsynced line; the append is the commit point.
+    updates = _updates_path(path)
+    if not os.path.exists(updates) or not _read_updates(path):
+        atomic_write(updates, json.dumps({'base': os.stat(path).st_ino}) + '\n', fsync=True)
+    with open(updates, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        torn = f.read(1) != b'\n'
+    with open(updates, 'a', encoding='utf-8') as f:
+        # Terminate a torn fragment so it can't swallow this record
+        f.write(('\n' if torn else '') + json.dumps(record) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _move_links(path, record):
+    # Caller holds the lock. Move the renamed user's link files, then mark
+    # the update done so the move is never replayed (the old name may be
+    # registered again and get links of its own).
+    try:
+        link_log.rename(record['links_dir'], record['old'], record['new'])
+    except FileExistsError:
+        # Links already exist under the new name; moving would clobber them
+        pass
+    _append_update(path, {'done': True})
+
+
+def _recover(path):
+    # Caller holds the lock. Finish the link move of an update a crash
+    # interrupted, before anything else can reuse the old name.
+    users = _index(path)
+    records = _read_updates(path)
+    last = records[-1] if records else None
+    if last and 'new' in last and last.get('links_dir') and last['old'] != last['new']:
+        _move_links(path, last)
+        _remember(path, users)
+    return users
+
+
+def recover(path):
+    # Startup step: finish an interrupted rename's link move
+    ensure_file(path)
+    with locked(path):
+        _recover(path)
+
+
+def update(path, username, name, email, new_username, password, links_dir=None):
+    # Change one user's record. The update is a single fsynced line appended
+    # to the update log (the commit point), followed by the link-file move
+    # and a "done" line; if a crash lands between them, recover() at startup
+    # or the next update/registration (under the same lock) finishes it.
+    # Returns the stored (normalized) username.
+    old_key = normalize(username)
+    new_key = normalize(new_username)
+    if not new_key:
+        raise AccountError("Username is required.")
+    ensure_file(path)
+    with locked(path):
+        users = _recover(path)
+        if old_key not in users:
+            raise AccountError("User not found.")
+        if new_key != old_key:
+            if new_key in users:
+                raise AccountError("Username already exists.")
+            if links_dir and link_log.has_links(links_dir, new_key):
+                raise AccountError(f"Links for '{new_key}' already exist; choose another username.")
+        row = dict(users[old_key], name=name.strip(), email=email.strip(), username=new_key, password=password)
+        record = {'old': old_key, 'new': new_key, 'row': row, 'links_dir': links_dir}
+
+        _append_update(path, record)
+        if links_dir and new_key != old_key:
+            _move_links(path, record)
+
+        _apply(users, record)
+        if len(_read_updates(path)) >= COMPACT_UPDATES:
+            _compact(path, users)
+        _remember(path, users)
+    return new_key
@@ -1,7 +1,16 @@
 import streamlit as st
-import pandas as pd
 import os
-import csv
+import sys
+import html
+
+# Shared helpers (locks, user_store) live at the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import accounts
+import link_health
+import link_io
+import link_log
+import link_meta
 
 # --- Configuration ---
 st.set_page_config(page_title="User System", layout="centered")
@@ -18,15 +27,12 @@ st.markdown("""
 
 # --- Constants ---
 CSV_FILE = 'users.csv'
-FIELDNAMES = ['name', 'email', 'username', 'password']
 LINKS_DIR = "user_links"
+LINKS_PAGE_SIZE = int(os.getenv("LINKS_PAGE_SIZE", "25"))
 os.makedirs(LINKS_DIR, exist_ok=True)
 
 # Ensure user file exists
-if not os.path.exists(CSV_FILE):
-    with open(CSV_FILE, 'w', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
-        writer.writeheader()
+accounts.ensure_file(CSV_FILE)
 
 # Initialize session state
 if "user" not in st.session_state:
@@ -57,20 +63,10 @@ if page == "Register":
     if st.button("Register"):
         if not all([name, email, username, password]):
             st.error("All fields are required.")
+        elif not accounts.register(CSV_FILE, name, email, username, password):
+            st.error("Username already exists.")
         else:
-            df = pd.read_csv(CSV_FILE)
-            if username in df["username"].astype(str).str.lower().tolist():
-                st.error("Username already exists.")
-            else:
-                with open(CSV_FILE, 'a', newline='') as f:
-                    writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
-                    writer.writerow({
-                        'name': name.strip(),
-                        'email': email.strip(),
-                        'username': username,
-                        'password': password
-                    })
-                st.success("Registration successful. You can now log in.")
+            st.success("Registration successful. You can now log in.")
 
 # --- Login Page ---
 if page == "Login":
@@ -80,11 +76,8 @@ if page == "Login":
 
     if st.button("Login"):
         try:
-            df = pd.read_csv(CSV_FILE)
-            df["username"] = df["username"].astype(str).str.strip().str.lower()
-            df["password"] = df["password"].astype(str).str.strip()
-
-            if ((df["username"] == login_user) & (df["password"] == login_pass)).any():
+            # O(1) lookup in the shared, mtime-invalidated user index
+            if accounts.check_login(CSV_FILE, login_user, login_pass):
                 st.session_state.user = login_user
                 st.success(f"Welcome back, {login_user}!")
                 st.rerun()
@@ -103,36 +96,64 @@ if page == "Links":
         st.warning("Please login first.")
         st.stop()
 
-    filepath = os.path.join(LINKS_DIR, f"{user}.csv")
-
     # Load links
     if "links" not in st.session_state:
-        if os.path.exists(filepath):
-            df = pd.read_csv(filepath)
-            st.session_state.links = df["link"].dropna().tolist()
-        else:
-            st.session_state.links = []
+        st.session_state.links = link_log.load(LINKS_DIR, user)
 
     # Delete handler
     def delete_link(index):
-        st.session_state.links.pop(index)
-        pd.DataFrame({"link": st.session_state.links}).to_csv(filepath, index=False)
+        link = st.session_state.links[index]
+        st.session_state.links = link_log.remove(LINKS_DIR, user, index, link)
         st.success("Link deleted!")
         st.rerun()
 
-    # Show saved links with delete
+    # Show saved links with delete. Links are normalized when written, so a
+    # rerun only filters indices and renders the visible page.
     if st.session_state.links:
         st.subheader("Saved Links")
-        for i, raw_link in enumerate(st.session_state.links):
-            # Fix protocol
-            fixed_link = raw_link.strip()
-            if not fixed_link.startswith(("http://", "https://")):
-                fixed_link = "https://" + fixed_link
+        query = st.text_input("🔍 Filter links", key="link_filter").strip().lower()
+        links = st.session_state.links
+        matches = [i for i, link in enumerate(links) if query in link.lower()] if query else range(len(links))
+        pages = max(1, (len(matches) + LINKS_PAGE_SIZE - 1) // LINKS_PAGE_SIZE)
+        if st.session_state.get("link_page", 1) > pages:
+            st.session_state.link_page = pages
+        current = st.number_input("Page", min_value=1, max_value=pages, step=1, key="link_page") if pages > 1 else 1
+        start = (current - 1) * LINKS_PAGE_SIZE
+        visible = matches[start:start + LINKS_PAGE_SIZE]
+        st.caption(f"Showing {start + 1 if visible else 0}–{start + len(visible)} of {len(matches)}"
+                   + (f" (filtered from {len(links)})" if query else ""))
+
+        # Health checks run on a background pool; this rerun shows whatever
+        # results are already cached and queues the visible links that are stale.
+        health = link_health.get_checker()
+        health.schedule(links[i] for i in visible)
+        # Titles and favicons likewise come only from the shared metadata cache
+        metadata = link_meta.get_cache()
+        metadata.schedule(links[i] for i in visible)
+        hcol1, hcol2 = st.columns([3, 1])
+        with hcol1:
+            if health.pending_count():
+                st.caption(f"⏳ Checking {health.pending_count()} links…")
+        with hcol2:
+            if st.button("🩺 Check all"):
+                health.schedule(links, force=True)
+                st.rerun()
 
+        for i in visible:
+            link = html.escape(links[i], quote=True)
+            status = html.escape(link_health.badge(health.get(links[i]), health.is_pending(links[i])))
+            meta = metadata.get(links[i]) or {}
+            icon = "🌐"
+            if meta.get("favicon"):
+                favicon = html.escape(meta["favicon"], quote=True)
+                icon = f"<img src='{favicon}' width='16' height='16' style='vertical-align:middle'>"
+            label = html.escape(meta["title"]) if meta.get("title") else link
+            subtitle = f"<br><small>{link}</small>" if meta.get("title") else ""
             col1, col2 = st.columns([8, 1])
             with col1:
                 st.markdown(
-                    f"{i+1}. <a href='{fixed_link}' target='_blank' rel='noopener noreferrer'>🌐 {fixed_link}</a>",
+                    f"{i+1}. {icon} <a href='{link}' target='_blank' rel='noopener noreferrer'>{label}</a> "
+                    f"<small>{status}</small>{subtitle}",
                     unsafe_allow_html=True
                 )
             with col2:
@@ -147,16 +168,51 @@ if page == "Links":
         new_link = st.text_input("Enter link", key="new_link_input")
         if st.button("Save Link"):
             if new_link.strip():
-                fixed_new_link = new_link.strip()
-                if not fixed_new_link.startswith(("http://", "https://")):
-                    fixed_new_link = "https://" + fixed_new_link
-                st.session_state.links.append(fixed_new_link)
-                pd.DataFrame({"link": st.session_state.links}).to_csv(filepath, index=False)
-                st.success("Link saved!")
-                st.rerun()
+                added, _ = link_io.import_links(LINKS_DIR, user, [new_link])
+                st.session_state.links = link_log.load(LINKS_DIR, user)
+                if added:
+                    st.success("Link saved!")
+                    st.rerun()
+                else:
+                    st.info("That link is already saved.")
             else:
                 st.warning("Please enter a valid link.")
 
+    # Bulk import / export
+    with st.expander("📥 Import / 📤 Export"):
+        pasted = st.text_area("Paste links (one per line)", key="import_text")
+        uploaded = st.file_uploader("...or upload a text, CSV or bookmarks HTML file",
+                                    type=["txt", "csv", "html", "htm"], key="import_file")
+        if st.button("Import"):
+            sources = []
+            if pasted.strip():
+                sources.append(link_io.iter_links(pasted))
+            if uploaded is not None:
+                sources.append(link_io.iter_links(uploaded, uploaded.name))
+            if not sources:
+                st.warning("Paste links or choose a file first.")
+            else:
+                added = skipped = 0
+                for source in sources:
+                    a, s = link_io.import_links(LINKS_DIR, user, source)
+                    added, skipped = added + a, skipped + s
+                st.session_state.links = link_log.load(LINKS_DIR, user)
+                st.success(f"Imported {added} links ({skipped} duplicates or blanks skipped).")
+
+        # Built only on request, and only kept while the list is unchanged
+        # (every write replaces st.session_state.links with a new list)
+        fmt = st.radio("Export format", list(link_io.EXPORTS), horizontal=True)
+        export = st.session_state.get("link_export")
+        if export and (export["links"] is not st.session_state.links or export["fmt"] != fmt):
+            export = st.session_state.link_export = None
+        if st.button("📦 Prepare export"):
+            data, mime, ext = link_io.export_bytes(st.session_state.links, fmt)
+            export = st.session_state.link_export = {"links": st.session_state.links, "fmt": fmt,
+                                                     "data": data, "mime": mime, "ext": ext}
+        if export:
+            st.download_button(f"Download {fmt}", export["data"],
+                               file_name=f"{user}_links.{export['ext']}", mime=export["mime"])
+
 
 # --- Profile Page ---
 if page == "Profile":
@@ -166,41 +222,24 @@ if page == "Profile":
         st.warning("Please login first.")
         st.stop()
 
-    df = pd.read_csv(CSV_FILE)
-    user_row = df[df["username"].str.lower() == user.lower()]
-
-    if user_row.empty:
+    row = accounts.find(CSV_FILE, user)
+    if row is None:
         st.error("User not found.")
         st.stop()
 
-    idx = user_row.index[0]
-    row = user_row.iloc[0]
-
     new_name = st.text_input("Name", row["name"])
     new_email = st.text_input("Email", row["email"])
     new_username = st.text_input("Username", row["username"])
     new_password = st.text_input("Password", row["password"], type="password")
 
     if st.button("Update Profile"):
-        df.at[idx, "name"] = new_name
-        df.at[idx, "email"] = new_email
-        df.at[idx, "username"] = new_username
-        df.at[idx, "password"] = new_password
-        df.to_csv(CSV_FILE, index=False)
-
-        # Rename link file if username changed
-        old_path = os.path.join(LINKS_DIR, f"{user}.csv")
-        new_path = os.path.join(LINKS_DIR, f"{new_username.lower().strip()}.csv")
-        if user != new_username.lower().strip() and os.path.exists(old_path):
-            os.rename(old_path, new_path)
-
-        st.session_state.user = new_username.lower().strip()
-        st.success("Profile updated!")
-        st.rerun()
-
-
-
-
-
-
-
+        try:
+            # One locked, journaled commit covers the record and the link files
+            st.session_state.user = accounts.update(
+                CSV_FILE, user, new_name, new_email, new_username, new_password, links_dir=LINKS_DIR
+            )
+        except accounts.AccountError as e:
+            st.error(str(e))
+        else:
+            st.success("Profile updated!")
+            st.rerun()
@@ -0,0 +1,119 @@
+import os
+import time
+import socket
+import ipaddress
+import threading
+import urllib.error
+import urllib.request
+from collections import deque
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+# Links are user-supplied and fetched from the server, so loopback, private,
+# link-local (cloud metadata) and other non-public addresses are refused.
+# LINK_FETCH_ALLOW_PRIVATE=1 (or allow_private=True on a checker/cache, as
+# the tests do for their local HTTP stand-in) lifts the restriction.
+ALLOW_PRIVATE = os.getenv("LINK_FETCH_ALLOW_PRIVATE", "0") == "1"
+
+
+class BlockedAddress(urllib.error.URLError):
+    pass
+
+
+def check_url(url, allow_private=None):
+    # Raise BlockedAddress unless every address `url`'s host resolves to is
+    # public (or private addresses are allowed; default ALLOW_PRIVATE).
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise BlockedAddress(f"unsupported URL: {url}")
+    if ALLOW_PRIVATE if allow_private is None else allow_private:
+        return
+    try:
+        infos = socket.getaddrinfo(parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+    except socket.gaierror as e:
+        raise urllib.error.URLError(e)
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+        if not address.is_global or address.is_multicast:
+            raise BlockedAddress(f"blocked non-public address {address}")
+
+
+class _CheckedRedirects(urllib.request.HTTPRedirectHandler):
+    def __init__(self, allow_private=None):
+        self.allow_private = allow_private
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        check_url(newurl, self.allow_private)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+_openers = {}
+
+
+def urlopen(request, timeout, allow_private=None):
+    # urllib's urlopen with the address check applied to the URL and to
+    # every redirect it follows.
+    check_url(request.full_url, allow_private)
+    opener = _openers.get(allow_private)
+    if opener is None:
+        opener = _openers[allow_private] = urllib.request.build_opener(_CheckedRedirects(allow_private))
+    return opener.open(request, timeout=timeout)
+
+
+class HostPool:
+    # Bounded worker pool with per-host politeness: at most `per_host` jobs
+    # in flight per host, started at least `host_interval` apart. Jobs for a
+    # busy host wait in that host's queue rather than holding a worker, so
+    # one host with many links can't starve the others.
+
+    def __init__(self, max_workers, per_host, host_interval=0.0, name="fetch"):
+        self.per_host = per_host
+        self.host_interval = host_interval
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self.lock = threading.Lock()
+        self.hosts = {}  # host -> {"queue", "active", "next", "timer"}
+
+    def submit(self, url, fn):
+        # Run `fn(url)` on the pool when `url`'s host has capacity
+        host = urlsplit(url).netloc.lower()
+        with self.lock:
+            state = self.hosts.setdefault(host, {"queue": deque(), "active": 0, "next": 0.0, "timer": None})
+            state["queue"].append((url, fn))
+        self._dispatch(host)
+
+    def _dispatch(self, host, from_timer=False):
+        ready = []
+        with self.lock:
+            state = self.hosts.get(host)
+            if state is None:
+                # Another thread's dispatch already ran and drained it
+                return
+            if state["timer"] is not None and not from_timer:
+                return
+            state["timer"] = None
+            while state["queue"] and state["active"] < self.per_host:
+                delay = state["next"] - time.time()
+                if delay > 0:
+                    # Come back when the spacing allows the next start
+                    state["timer"] = threading.Timer(delay, self._dispatch, (host, True))
+                    state["timer"].daemon = True
+                    state["timer"].start()
+                    break
+                state["active"] += 1
+                state["next"] = time.time() + self.host_interval
+                ready.append(state["queue"].popleft())
+        for url, fn in ready:
+            self.pool.submit(self._run, host, url, fn)
+
+    def _run(self, host, url, fn):
+        try:
+            fn(url)
+        finally:
+            with self.lock:
+                state = self.hosts[host]
+                state["active"] -= 1
+                waiting = state["timer"] is None and bool(state["queue"])
+                if not state["queue"] and not state["active"]:
+                    del self.hosts[host]
+            if waiting:
+                self._dispatch(host)
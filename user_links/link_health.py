@@ -0,0 +1,124 @@
+import os
+import time
+import threading
+import urllib.error
+import urllib.request
+
+from fetching import HostPool, urlopen
+
+HEALTH_WORKERS = int(os.getenv("LINK_HEALTH_WORKERS", "8"))
+# Politeness: at most this many requests in flight per host, spaced apart
+HEALTH_PER_HOST = int(os.getenv("LINK_HEALTH_PER_HOST", "2"))
+HEALTH_HOST_INTERVAL = float(os.getenv("LINK_HEALTH_HOST_INTERVAL", "0.5"))
+HEALTH_TTL = float(os.getenv("LINK_HEALTH_TTL", "3600"))
+HEALTH_TIMEOUT = float(os.getenv("LINK_HEALTH_TIMEOUT", "5"))
+USER_AGENT = "user-links-health/1.0"
+
+
+def check(url, timeout=HEALTH_TIMEOUT, allow_private=None):
+    # HEAD first (cheap), GET if the server doesn't allow it. Redirects are
+    # followed; the final URL is reported when it differs.
+    started = time.time()
+    result = {"url": url, "status": None, "redirect": None, "error": None}
+    for method in ("HEAD", "GET"):
+        request = urllib.request.Request(url, method=method, headers={"User-Agent": USER_AGENT})
+        try:
+            with urlopen(request, timeout, allow_private) as response:
+                result["status"] = response.status
+                final = response.geturl()
+        except urllib.error.HTTPError as e:
+            result["status"] = e.code
+            final = e.geturl() or url
+        except Exception as e:
+            result["error"] = str(getattr(e, "reason", e))
+            final = url
+        if result["status"] not in (405, 501):
+            break
+    result["redirect"] = final if final != url else None
+    result["latency"] = time.time() - started
+    result["checked_at"] = time.time()
+    return result
+
+
+class HealthChecker:
+    # Checks links on a bounded, per-host polite pool and caches results for
+    # `ttl` seconds. `schedule` never waits and `get` never does I/O, so a
+    # page render only reads what earlier checks produced.
+
+    def __init__(self, max_workers=HEALTH_WORKERS, per_host=HEALTH_PER_HOST,
+                 host_interval=HEALTH_HOST_INTERVAL, ttl=HEALTH_TTL, timeout=HEALTH_TIMEOUT,
+                 allow_private=None):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.allow_private = allow_private
+        self.pool = HostPool(max_workers, per_host, host_interval, name="link-health")
+        self.cond = threading.Condition()
+        self.results = {}   # url -> result
+        self.pending = set()
+
+    def get(self, url):
+        with self.cond:
+            return self.results.get(url)
+
+    def is_pending(self, url):
+        with self.cond:
+            return url in self.pending
+
+    def pending_count(self):
+        with self.cond:
+            return len(self.pending)
+
+    def _fresh(self, url, now):
+        result = self.results.get(url)
+        return result is not None and now - result["checked_at"] < self.ttl
+
+    def schedule(self, urls, force=False):
+        # Queue every URL without a fresh result; returns how many were queued.
+        now = time.time()
+        queued = []
+        with self.cond:
+            for url in urls:
+                if url in self.pending or (not force and self._fresh(url, now)):
+                    continue
+                self.pending.add(url)
+                queued.append(url)
+        for url in queued:
+            self.pool.submit(url, self._run)
+        return len(queued)
+
+    def _run(self, url):
+        try:
+            result = check(url, self.timeout, self.allow_private)
+        except Exception as e:
+            result = {"url": url, "status": None, "redirect": None, "error": str(e),
+                      "latency": None, "checked_at": time.time()}
+        with self.cond:
+            self.results[url] = result
+            self.pending.discard(url)
+            self.cond.notify_all()
+
+
+def badge(result, pending=False):
+    if result is None:
+        return "⏳" if pending else "⚪"
+    status = result["status"]
+    if status is None:
+        return f"🔴 {result['error'] or 'unreachable'}"
+    latency = f" · {int(result['latency'] * 1000)} ms" if result.get("latency") is not None else ""
+    if status >= 400:
+        return f"🔴 {status}{latency}"
+    if result["redirect"]:
+        return f"🟡 {status} → {result['redirect']}{latency}"
+    return f"🟢 {status}{latency}"
+
+
+_checker = None
+_checker_lock = threading.Lock()
+
+
+def get_checker():
+    global _checker
+    with _checker_lock:
+        if _checker is None:
+            _checker = HealthChecker()
+        return _checker
@@ -0,0 +1,125 @@
+import io
+import csv
+import json
+import html
+from html.parser import HTMLParser
+
+import link_log
+
+CHUNK_SIZE = 64 * 1024
+# Links per log record during an import, so a huge import is a few appends
+IMPORT_BATCH = 1000
+
+
+def _text(stream):
+    # Uploaded files are binary; pasted text is already str
+    if isinstance(stream, str):
+        return io.StringIO(stream)
+    if isinstance(stream.read(0), bytes):
+        return io.TextIOWrapper(stream, encoding="utf-8", errors="replace")
+    return stream
+
+
+def iter_lines(stream):
+    # One link per line; also accepts our own CSV export (header "link")
+    for line in _text(stream):
+        link = line.strip().strip('"')
+        if link and link.lower() != "link" and not link.startswith("#"):
+            yield link
+
+
+class _Bookmarks(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.found = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            href = dict(attrs).get("href")
+            if href and href.lower().startswith(("http://", "https://")):
+                self.found.append(href)
+
+
+def iter_bookmarks(stream):
+    # Netscape bookmark file (what browsers export), parsed chunk by chunk
+    parser = _Bookmarks()
+    text = _text(stream)
+    while True:
+        chunk = text.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        parser.feed(chunk)
+        yield from parser.found
+        parser.found.clear()
+    parser.close()
+    yield from parser.found
+
+
+def iter_links(stream, name=""):
+    # Pick the parser from the file name, or by sniffing the first bytes
+    if isinstance(stream, str):
+        is_html = stream.lstrip()[:15].lower().startswith(("<!doctype", "<html", "<dl"))
+    elif name:
+        is_html = name.lower().endswith((".html", ".htm"))
+    else:
+        is_html = False
+    return iter_bookmarks(stream) if is_html else iter_lines(stream)
+
+
+def import_links(directory, user, links):
+    # Stream `links` into the log in batches; normalizing and deduping
+    # happen in link_log.add_unique under the log lock. Returns
+    # (added, skipped).
+    batch = []
+    added = total = 0
+    for link in links:
+        total += 1
+        batch.append(link)
+        if len(batch) >= IMPORT_BATCH:
+            added += link_log.add_unique(directory, user, batch)[1]
+            batch = []
+    if batch:
+        added += link_log.add_unique(directory, user, batch)[1]
+    return added, total - added
+
+
+def export_csv(links):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["link"])
+    yield out.getvalue()
+    for link in links:
+        out.seek(0)
+        out.truncate()
+        writer.writerow([link])
+        yield out.getvalue()
+
+
+def export_json(links):
+    yield "["
+    for i, link in enumerate(links):
+        yield ("," if i else "") + "\n " + json.dumps(link)
+    yield "\n]\n"
+
+
+def export_html(links):
+    # Netscape bookmark format, importable by any browser
+    yield ("<!DOCTYPE NETSCAPE-Bookmark-file-1>\n"
+           '<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">\n'
+           "<TITLE>Bookmarks</TITLE>\n<H1>Bookmarks</H1>\n<DL><p>\n")
+    for link in links:
+        escaped = html.escape(link)
+        yield f'    <DT><A HREF="{escaped}">{escaped}</A>\n'
+    yield "</DL><p>\n"
+
+
+EXPORTS = {
+    "CSV": (export_csv, "text/csv", "csv"),
+    "JSON": (export_json, "application/json", "json"),
+    "HTML": (export_html, "text/html", "html"),
+}
+
+
+def export_bytes(links, fmt):
+    generate, mime, ext = EXPORTS[fmt]
+    return "".join(generate(links)).encode("utf-8"), mime, ext
@@ -0,0 +1,222 @@
+import os
+import csv
+import json
+import threading
+from urllib.parse import urlsplit, urlunsplit
+
+from locks import locked, atomic_write
+
+# Each user's links live in an append-only log `<dir>/<user>.log`, one JSON
+# record per line:
+#   {"op": "snapshot", "links": [...]}   full list (first line after compaction)
+#   {"op": "add", "links": [...]}        appended to the end
+#   {"op": "del", "index": i}            list.pop(i)
+# Saving a link appends one line instead of rewriting the whole list.
+COMPACT_THRESHOLD = int(os.getenv("LINK_LOG_COMPACT", "500"))
+
+# Replayed lists per log, advanced incrementally: path -> state
+_cache = {}
+_cache_lock = threading.Lock()
+_compacting = set()
+
+
+def fix_protocol(link):
+    # The page's rule: bare hosts get https://. Applied once when a link is
+    # written, so rendering never has to.
+    link = link.strip()
+    if link.lower().startswith(("http://", "https://")):
+        scheme, rest = link.split("://", 1)
+        return scheme.lower() + "://" + rest
+    if link:
+        link = "https://" + link
+    return link
+
+
+def canonical(link):
+    # Dedupe key: scheme/host case, default ports and a bare "/" path don't
+    # make two links different.
+    parts = urlsplit(fix_protocol(link))
+    host = parts.netloc.lower()
+    if (parts.scheme, host[-3:]) == ("http", ":80") or (parts.scheme, host[-4:]) == ("https", ":443"):
+        host = host.rsplit(":", 1)[0]
+    path = "" if parts.path == "/" else parts.path
+    return urlunsplit((parts.scheme, host, path, parts.query, parts.fragment))
+
+
+def _unique(links, seen):
+    # Normalized links whose canonical form isn't in `seen` (updated in place)
+    kept = []
+    for link in links:
+        fixed = fix_protocol(link)
+        key = canonical(fixed)
+        if fixed and key not in seen:
+            seen.add(key)
+            kept.append(fixed)
+    return kept
+
+
+def log_path(directory, user):
+    return os.path.join(directory, f"{user}.log")
+
+
+def _legacy_path(directory, user):
+    return os.path.join(directory, f"{user}.csv")
+
+
+def _apply(links, record):
+    op = record.get("op")
+    if op == "snapshot":
+        links[:] = record["links"]
+    elif op == "add":
+        links.extend(record["links"])
+    elif op == "del" and 0 <= record["index"] < len(links):
+        links.pop(record["index"])
+
+
+def _migrate(directory, user):
+    # Caller holds the lock. Fold a legacy `<user>.csv` into a new log.
+    legacy = _legacy_path(directory, user)
+    path = log_path(directory, user)
+    if os.path.exists(path) or not os.path.exists(legacy):
+        return
+    with open(legacy, "r", newline="", encoding="utf-8") as f:
+        links = _unique((row["link"] for row in csv.DictReader(f) if row.get("link")), set())
+    atomic_write(path, json.dumps({"op": "snapshot", "links": links}) + "\n")
+    os.remove(legacy)
+
+
+def _replay(path):
+    # Only the bytes appended since the last call are read; a compaction
+    # replaces the file (new inode) and triggers a full replay.
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return [], 0
+    with _cache_lock:
+        state = _cache.get(path)
+        if not state or state["inode"] != st.st_ino or state["offset"] > st.st_size:
+            state = {"inode": st.st_ino, "offset": 0, "links": [], "ops": 0}
+        links = list(state["links"])
+        offset, ops = state["offset"], state["ops"]
+    with open(path, "r", encoding="utf-8") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith("\n"):
+                # Torn write from a crash mid-append; ignore the fragment
+                break
+            offset += len(line.encode("utf-8"))
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            _apply(links, record)
+            ops = 0 if record.get("op") == "snapshot" else ops + 1
+    with _cache_lock:
+        _cache[path] = {"inode": st.st_ino, "offset": offset, "links": links, "ops": ops}
+    return list(links), ops
+
+
+def load(directory, user):
+    path = log_path(directory, user)
+    if not os.path.exists(path) and os.path.exists(_legacy_path(directory, user)):
+        with locked(path):
+            _migrate(directory, user)
+    return _replay(path)[0]
+
+
+def _append(directory, user, record):
+    path = log_path(directory, user)
+    with locked(path):
+        _migrate(directory, user)
+        links, _ = _replay(path)
+        record = record(links) if callable(record) else record
+        if record is not None:
+            with _cache_lock:
+                offset = _cache.get(path, {}).get("offset", 0)
+            torn = os.path.exists(path) and os.path.getsize(path) > offset
+            with open(path, "a", encoding="utf-8") as f:
+                # Terminate a torn fragment so it can't swallow this record
+                f.write(("\n" if torn else "") + json.dumps(record) + "\n")
+        links, ops = _replay(path)
+    if ops > COMPACT_THRESHOLD:
+        _schedule_compaction(directory, user)
+    return links
+
+
+def add(directory, user, links):
+    links = [fix_protocol(link) for link in links]
+    links = [link for link in links if link]
+    if not links:
+        return load(directory, user)
+    return _append(directory, user, {"op": "add", "links": links})
+
+
+def add_unique(directory, user, links):
+    # Append the links not already saved (by canonical URL). The check runs
+    # under the log lock, so concurrent imports can't both add the same URL.
+    # Returns (links, number added).
+    added = []
+
+    def record(current):
+        added.extend(_unique(links, {canonical(link) for link in current}))
+        return {"op": "add", "links": added} if added else None
+    return _append(directory, user, record), len(added)
+
+
+def remove(directory, user, index, link=None):
+    # `index` is from the caller's (possibly stale) view; if another session
+    # changed the list since, delete the first occurrence of `link` instead.
+    def record(current):
+        i = index
+        if link is not None and not (0 <= i < len(current) and current[i] == link):
+            i = current.index(link) if link in current else -1
+        return {"op": "del", "index": i} if 0 <= i < len(current) else None
+    return _append(directory, user, record)
+
+
+def compact(directory, user):
+    # Rewrite the log as a single snapshot line, atomically.
+    path = log_path(directory, user)
+    with locked(path):
+        links, ops = _replay(path)
+        if ops:
+            atomic_write(path, json.dumps({"op": "snapshot", "links": links}) + "\n")
+            _replay(path)
+
+
+def _schedule_compaction(directory, user):
+    path = log_path(directory, user)
+    with _cache_lock:
+        if path in _compacting:
+            return
+        _compacting.add(path)
+
+    def run():
+        try:
+            compact(directory, user)
+        finally:
+            with _cache_lock:
+                _compacting.discard(path)
+
+    threading.Thread(target=run, name="link-log-compact", daemon=True).start()
+
+
+def has_links(directory, user):
+    return os.path.exists(log_path(directory, user)) or os.path.exists(_legacy_path(directory, user))
+
+
+def rename(directory, old, new):
+    # Move a user's links to a new name. Idempotent, so an interrupted
+    # profile update can simply be replayed; refuses to overwrite links that
+    # already exist under `new`.
+    with locked(log_path(directory, old)), locked(log_path(directory, new)):
+        for path in (log_path(directory, old), _legacy_path(directory, old)):
+            target = os.path.join(directory, f"{new}{os.path.splitext(path)[1]}")
+            if not os.path.exists(path):
+                continue
+            if os.path.exists(target):
+                raise FileExistsError(f"{target} already exists")
+            os.rename(path, target)
+        with _cache_lock:
+            _cache.pop(log_path(directory, old), None)
+            _cache.pop(log_path(directory, new), None)
@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import threading
+import urllib.request
+from collections import OrderedDict
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+from fetching import HostPool, urlopen
+from locks import locked, atomic_write
+
+META_WORKERS = int(os.getenv("LINK_META_WORKERS", "4"))
+META_PER_HOST = int(os.getenv("LINK_META_PER_HOST", "2"))
+META_TIMEOUT = float(os.getenv("LINK_META_TIMEOUT", "5"))
+# Entries kept in memory and on disk; least recently used are dropped first
+META_CACHE_SIZE = int(os.getenv("LINK_META_CACHE_SIZE", "5000"))
+# Failed fetches (timeouts, outages) are retried after this many seconds
+META_ERROR_TTL = float(os.getenv("LINK_META_ERROR_TTL", "300"))
+META_CACHE_FILE = os.getenv("LINK_META_CACHE_FILE", os.path.join("user_links", ".meta_cache.json"))
+# Only the head of a page is needed for <title> and icons
+MAX_HTML_BYTES = 64 * 1024
+SAVE_DELAY = 2.0
+USER_AGENT = "user-links-meta/1.0"
+
+
+class _Head(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.title = ""
+        self.icon = None
+        self.in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "title":
+            self.in_title = True
+        elif tag == "link" and attrs.get("href") and "icon" in (attrs.get("rel") or "").lower().split():
+            self.icon = self.icon or attrs["href"]
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self.in_title = False
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title += data
+
+
+def fetch(url, timeout=META_TIMEOUT, allow_private=None):
+    # {"title", "favicon"} for `url`; reads at most MAX_HTML_BYTES.
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    meta = {"title": None, "favicon": None, "fetched_at": time.time()}
+    try:
+        with urlopen(request, timeout, allow_private) as response:
+            final = response.geturl()
+            if "html" in (response.headers.get("Content-Type") or "html"):
+                charset = response.headers.get_content_charset() or "utf-8"
+                parser = _Head()
+                parser.feed(response.read(MAX_HTML_BYTES).decode(charset, errors="replace"))
+                meta["title"] = " ".join(parser.title.split())[:200] or None
+                if parser.icon:
+                    meta["favicon"] = urljoin(final, parser.icon)
+    except Exception as e:
+        meta["error"] = str(getattr(e, "reason", e))
+        return meta
+    if not meta["favicon"]:
+        parts = urlsplit(final)
+        meta["favicon"] = f"{parts.scheme}://{parts.netloc}/favicon.ico"
+    return meta
+
+
+class MetadataCache:
+    # URL -> metadata, shared by every user and session. Each URL is fetched
+    # once however many users saved it; pages only ever read the cache.
+
+    def __init__(self, path=META_CACHE_FILE, max_entries=META_CACHE_SIZE,
+                 max_workers=META_WORKERS, per_host=META_PER_HOST, timeout=META_TIMEOUT,
+                 error_ttl=META_ERROR_TTL, allow_private=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.error_ttl = error_ttl
+        self.allow_private = allow_private
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.pending = set()
+        self.save_timer = None
+        self.pool = HostPool(max_workers, per_host, name="link-meta")
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        for url, meta in saved[-self.max_entries:]:
+            self.entries[url] = meta
+
+    def get(self, url):
+        with self.lock:
+            meta = self.entries.get(url)
+            if meta is not None:
+                self.entries.move_to_end(url)
+            return meta
+
+    def _stale(self, url, now):
+        # Missing, or a failure old enough to try again
+        meta = self.entries.get(url)
+        return meta is None or (meta.get("error") is not None and now - meta["fetched_at"] >= self.error_ttl)
+
+    def schedule(self, urls):
+        now = time.time()
+        queued = []
+        with self.lock:
+            for url in urls:
+                if url in self.pending or not self._stale(url, now):
+                    continue
+                self.pending.add(url)
+                queued.append(url)
+        for url in queued:
+            self.pool.submit(url, self._run)
+        return len(queued)
+
+    def _run(self, url):
+        try:
+            meta = fetch(url, self.timeout, self.allow_private)
+        except Exception as e:
+            meta = {"title": None, "favicon": None, "fetched_at": time.time(), "error": str(e)}
+        with self.lock:
+            self.pending.discard(url)
+            self.entries[url] = meta
+            self.entries.move_to_end(url)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            if self.save_timer is None:
+                # Batch the disk writes of a burst of fetches
+                self.save_timer = threading.Timer(SAVE_DELAY, self.save)
+                self.save_timer.daemon = True
+                self.save_timer.start()
+
+    def save(self):
+        with self.lock:
+            self.save_timer = None
+            snapshot = list(self.entries.items())
+        with locked(self.path):
+            atomic_write(self.path, json.dumps(snapshot))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = MetadataCache()
+        return _cache
@@ -0,0 +1,132 @@
+import os
+import csv
+import threading
+
+from locks import locked
+
+FIELDS = ["username", "password", "recovery_hint"]
+
+# Process-wide cache shared by every session: (path, reader) -> state
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _stat_key(path):
+    # The inode changes on every atomic replace, so an equal-size rewrite
+    # within one mtime tick still invalidates
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _key(path, also):
+    # Stat of `path` plus any companion files it is read together with
+    key = [_stat_key(path)]
+    for extra in also:
+        try:
+            key.append(_stat_key(extra))
+        except FileNotFoundError:
+            key.append(None)
+    return tuple(key)
+
+
+def cached(path, read, also=()):
+    # `read(path)`, re-run only when the file on disk (or a file in `also`)
+    # changed because another session or process wrote it, otherwise the
+    # cached result.
+    key = _key(path, also)
+    with _cache_lock:
+        state = _cache.get((path, read))
+        if state and state["key"] == key:
+            return state["value"]
+    value = read(path)
+    with _cache_lock:
+        _cache[(path, read)] = {"key": key, "value": value}
+    return value
+
+
+def remember(path, read, value, also=()):
+    # Caller just wrote `path` under its lock and knows what `read` would
+    # return now; store it instead of re-parsing.
+    with _cache_lock:
+        _cache[(path, read)] = {"key": _key(path, also), "value": value}
+
+
+def _read(path):
+    users = {}
+    with open(path, "r", newline='') as f:
+        for row in csv.DictReader(f):
+            name = row.get("username")
+            if not name:
+                continue
+            users[name] = {
+                "password": row.get("password", ""),
+                "recovery_hint": row.get("recovery_hint", "")
+            }
+    return users
+
+
+def ensure_store(path):
+    if not os.path.exists(path):
+        with locked(path):
+            if not os.path.exists(path):
+                with open(path, "w", newline='') as f:
+                    csv.writer(f).writerow(FIELDS)
+
+
+def _index(path):
+    # Re-parse only when the file on disk changed (another session or process
+    # appended), otherwise serve the cached dict.
+    ensure_store(path)
+    return cached(path, _read)
+
+
+def all_users(path):
+    return dict(_index(path))
+
+
+def get_user(path, username):
+    return _index(path).get(username)
+
+
+def user_exists(path, username):
+    return username in _index(path)
+
+
+def check_login(path, username, password):
+    record = get_user(path, username)
+    return record is not None and record["password"] == password
+
+
+def add_user(path, username, password, hint):
+    # Returns False if the username is already taken. The existence check and
+    # the append happen under the same lock, so two sessions can't both win.
+    ensure_store(path)
+    with locked(path):
+        users = _index(path)
+        if username in users:
+            return False
+        with open(path, "a", newline='') as f:
+            csv.writer(f).writerow([username, password, hint])
+        users[username] = {"password": password, "recovery_hint": hint}
+        remember(path, _read, users)
+    return True
+
+
+def migrate_csv(src_path, dest_path):
+    # Import users from a legacy CSV (any column order, extra columns ignored)
+    # into the store, once: the source is renamed to `<src>.migrated`
+    # afterwards. Existing usernames are kept; returns the number added.
+    added = 0
+    with locked(src_path):
+        if not os.path.exists(src_path):
+            return 0
+        with open(src_path, "r", newline='') as f:
+            for row in csv.DictReader(f):
+                name = (row.get("username") or "").strip()
+                if not name:
+                    continue
+                if add_user(dest_path, name, row.get("password", ""),
+                            row.get("recovery_hint", "")):
+                    added += 1
+        os.replace(src_path, src_path + ".migrated")
+    return added